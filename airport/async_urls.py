@@ -0,0 +1,37 @@
+from django.urls import path
+
+from airport.async_views import (
+    AsyncAirplaneTypeListView,
+    AsyncAirplaneListView,
+    AsyncLocationListView,
+    AsyncAirportListView,
+    AsyncCrewListView,
+    AsyncRouteListView,
+    AsyncFlightListView,
+    AsyncFlightDetailView,
+)
+
+urlpatterns = [
+    path(
+        "airplane_types/",
+        AsyncAirplaneTypeListView.as_view(),
+        name="airplanetype-list",
+    ),
+    path(
+        "airplanes/", AsyncAirplaneListView.as_view(), name="airplane-list"
+    ),
+    path(
+        "locations/", AsyncLocationListView.as_view(), name="location-list"
+    ),
+    path("airports/", AsyncAirportListView.as_view(), name="airport-list"),
+    path("crews/", AsyncCrewListView.as_view(), name="crew-list"),
+    path("routes/", AsyncRouteListView.as_view(), name="route-list"),
+    path("flights/", AsyncFlightListView.as_view(), name="flight-list"),
+    path(
+        "flights/<str:pk>/",
+        AsyncFlightDetailView.as_view(),
+        name="flight-detail",
+    ),
+]
+
+app_name = "airport_async"
@@ -0,0 +1,172 @@
+from abc import abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import QuerySet
+from django.http import Http404, HttpResponse
+from rest_framework.response import Response
+
+from airport.cache import AsyncCachedListMixin
+from airport.conditional import (
+    AsyncConditionalGetMixin,
+    ConditionalGetMixin,
+)
+from airport.models import Flight
+from airport.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport.serializers import (
+    AirplaneTypeSerializer,
+    AirplaneListSerializer,
+    LocationSerializer,
+    AirportListValuesSerializer,
+    CrewSerializer,
+    RouteListValuesSerializer,
+    FlightListValuesSerializer,
+    FlightDetailSerializer,
+)
+from airport.views import (
+    AirplaneTypeViewSet,
+    AirplaneViewSet,
+    LocationViewSet,
+    AirportViewSet,
+    CrewViewSet,
+    RouteViewSet,
+    FlightPagination,
+    FlightViewSet,
+)
+from airport_service.async_views import AsyncAPIView, AsyncListView
+
+
+class AsyncAirplaneTypeListView(
+    AsyncConditionalGetMixin, AsyncCachedListMixin, AsyncListView
+):
+    queryset = AirplaneTypeViewSet.queryset
+    versioned_models = AirplaneTypeViewSet.versioned_models
+    serializer_class = AirplaneTypeSerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+
+
+class AsyncAirplaneListView(
+    AsyncConditionalGetMixin, AsyncCachedListMixin, AsyncListView
+):
+    queryset = AirplaneViewSet.queryset
+    versioned_models = AirplaneViewSet.versioned_models
+    serializer_class = AirplaneListSerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+
+
+class AsyncLocationListView(
+    AsyncConditionalGetMixin, AsyncCachedListMixin, AsyncListView
+):
+    queryset = LocationViewSet.queryset
+    versioned_models = LocationViewSet.versioned_models
+    serializer_class = LocationSerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+
+
+class AsyncAirportListView(
+    AsyncConditionalGetMixin, AsyncCachedListMixin, AsyncListView
+):
+    queryset = AirportViewSet.queryset
+    versioned_models = AirportViewSet.versioned_models
+    values_serializer_class = AirportListValuesSerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+
+
+class AsyncCrewListView(
+    AsyncConditionalGetMixin, AsyncCachedListMixin, AsyncListView
+):
+    queryset = CrewViewSet.queryset
+    versioned_models = CrewViewSet.versioned_models
+    serializer_class = CrewSerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+
+
+class AsyncRouteListView(
+    AsyncConditionalGetMixin, AsyncCachedListMixin, AsyncListView
+):
+    queryset = RouteViewSet.queryset
+    versioned_models = RouteViewSet.versioned_models
+    values_serializer_class = RouteListValuesSerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+
+
+class AsyncFlightView(ConditionalGetMixin, AsyncAPIView):
+    """Sends the validators of FlightViewSet with the response of
+    ``get_flight_response``"""
+
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    versioned_models = FlightViewSet.versioned_models
+    lookup_field = "pk"
+    lookup_url_kwarg = None
+
+    def get_queryset(self) -> QuerySet:
+        return FlightViewSet.queryset
+
+    async def get_response(self, request, *args, **kwargs) -> HttpResponse:
+        return await self.aconditional_response(
+            request, self.get_flight_response, *args, **kwargs
+        )
+
+    @abstractmethod
+    async def get_flight_response(self, request, *args, **kwargs) -> Response:
+        """The response to a request with fresh validators"""
+
+
+class AsyncFlightListView(AsyncFlightView):
+    """Flight list and search of FlightViewSet, with the same filters"""
+
+    throttle_scope = "flight_search"
+
+    @staticmethod
+    async def search_airport_ids(query: str) -> QuerySet | list[int] | None:
+        if not query:
+            return None
+        # the fuzzy airport search has no async version
+        return await sync_to_async(FlightViewSet._search_airport_ids)(query)
+
+    async def get_flight_response(
+        self, request, *args, **kwargs
+    ) -> Response:
+        params = request.query_params
+        queryset = FlightViewSet.filter_flights(
+            self.get_queryset(),
+            params,
+            departure_ids=await self.search_airport_ids(
+                params.get("departure")
+            ),
+            arrival_ids=await self.search_airport_ids(params.get("arrival")),
+        )
+
+        values_serializer = FlightListValuesSerializer(
+            context=self.get_serializer_context()
+        )
+        paginator = FlightPagination()
+        window = paginator.get_window(
+            values_serializer.get_queryset(queryset), request
+        )
+        page = paginator.get_page([row async for row in window.aiterator()])
+        return paginator.get_paginated_response(
+            values_serializer.serialize(page)
+        )
+
+
+class AsyncFlightDetailView(AsyncFlightView):
+    last_modified_field = FlightViewSet.last_modified_field
+
+    async def get_flight_response(
+        self, request, *args, **kwargs
+    ) -> Response:
+        try:
+            flight = await self.get_queryset().aget(pk=kwargs["pk"])
+        except (
+            Flight.DoesNotExist,
+            TypeError,
+            ValueError,
+            DjangoValidationError,
+        ):
+            raise Http404
+        return Response(
+            FlightDetailSerializer(
+                flight, context=self.get_serializer_context()
+            ).data
+        )
@@ -0,0 +1,79 @@
+import re
+
+from airport.cache import ProcessLocalCache
+from airport.models import Airport, Location
+
+MAX_SUGGESTIONS = 20
+
+
+class TrieNode:
+    __slots__ = ("children", "suggestions")
+
+    def __init__(self) -> None:
+        self.children = {}
+        self.suggestions = []
+
+
+class PrefixTrie:
+    """Prefix tree keeping the first MAX_SUGGESTIONS payloads per node.
+
+    Payloads are inserted in display order, so a lookup is a walk down
+    ``len(prefix)`` nodes and a slice, independent of the number of keys.
+    """
+
+    def __init__(self) -> None:
+        self.root = TrieNode()
+
+    def insert(self, key: str, suggestion: dict) -> None:
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, TrieNode())
+            if (
+                len(node.suggestions) < MAX_SUGGESTIONS
+                and suggestion not in node.suggestions
+            ):
+                node.suggestions.append(suggestion)
+
+    def search(self, prefix: str, limit: int) -> list[dict]:
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.suggestions[:limit]
+
+
+def autocomplete_keys(*names: str):
+    """Every word suffix of the names: "London Heathrow" is found by
+    "lon", "london h" and "hea" alike"""
+    for name in names:
+        words = re.findall(r"\w+", name.lower())
+        for index in range(len(words)):
+            yield " ".join(words[index:])
+
+
+def build_trie() -> PrefixTrie:
+    trie = PrefixTrie()
+    airports = Airport.objects.order_by("name", "id").values_list(
+        "id", "name", "location__city", "location__country"
+    )
+    for airport_id, name, city, country in airports:
+        suggestion = {
+            "id": airport_id,
+            "name": name,
+            "city": city,
+            "country": country,
+        }
+        for key in autocomplete_keys(name, city, country):
+            trie.insert(key, suggestion)
+    return trie
+
+
+trie_cache = ProcessLocalCache(build_trie, models=(Airport, Location))
+
+
+def autocomplete_airports(prefix: str, limit: int = 10) -> list[dict]:
+    prefix = " ".join(re.findall(r"\w+", prefix.lower()))
+    if not prefix:
+        return []
+    return trie_cache.get().search(prefix, min(limit, MAX_SUGGESTIONS))
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Generic, TypeVar
+
+from django.core.cache import cache
+from django.db.models import Model
+from django.http import HttpResponse
+
+from airport_service.db.replica import primary_after_changes
+
+T = TypeVar("T")
+
+VERSION_KEY = "version:{}"
+
+
+def version_key(model: type[Model]) -> str:
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def version_stamp() -> int:
+    """Versions are microsecond timestamps of the last change, so they
+    double as Last-Modified values"""
+    return time.time_ns() // 1000
+
+
+def get_versions(*models: type[Model]) -> tuple[int, ...]:
+    """Current data version of every model, one cache round trip"""
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, version_stamp(), timeout=None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+async def aget_versions(*models: type[Model]) -> tuple[int, ...]:
+    keys = [version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, version_stamp(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_version(model: type[Model]) -> None:
+    """Invalidate everything cached for data of the model"""
+    key = version_key(model)
+    cache.set(
+        key,
+        max(version_stamp(), (cache.get(key) or 0) + 1),
+        timeout=None,
+    )
+
+
+class ProcessLocalCache(Generic[T]):
+    """Value built lazily once per process.
+
+    It is rebuilt when the version of one of ``models`` changes, so a
+    write in any worker process reaches every other process too.
+    """
+
+    def __init__(
+        self, build: Callable[[], T], models: tuple[type[Model], ...] = ()
+    ) -> None:
+        self.build = build
+        self.models = models
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        versions = get_versions(*self.models)
+        entry = self._entry
+        if entry is None or entry[0] != versions:
+            with self._lock:
+                entry = self._entry
+                if entry is None or entry[0] != versions:
+                    with primary_after_changes(versions):
+                        entry = (versions, self.build())
+                    self._entry = entry
+        return entry[1]
+
+    def invalidate(self) -> None:
+        self._entry = None
+
+
+class CachedListMixin:
+    """Serve rendered list responses from the cache.
+
+    The key includes the versions of ``versioned_models``, so a write to
+    any of them makes every cached list depending on it unreachable.
+    """
+
+    versioned_models = ()
+    cache_timeout = 60 * 60
+    # the browsable API page embeds user and CSRF data
+    uncached_formats = ("api",)
+
+    def get_list_cache_key(self, request, versions: tuple) -> str:
+        raw_key = "|".join(
+            [
+                request.build_absolute_uri(),
+                request.accepted_renderer.format,
+                *map(str, versions),
+            ]
+        )
+        return "list:" + hashlib.md5(raw_key.encode()).hexdigest()
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format in self.uncached_formats:
+            return super().list(request, *args, **kwargs)
+
+        versions = get_versions(*self.versioned_models)
+        key = self.get_list_cache_key(request, versions)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        self.list_cache_key = key
+        with primary_after_changes(versions):
+            return super().list(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        key = getattr(self, "list_cache_key", None)
+        if key is not None and response.status_code == 200:
+            response.render()
+            cache.set(
+                key,
+                (response.content, response["Content-Type"]),
+                self.cache_timeout,
+            )
+        return response
+
+
+class AsyncCachedListMixin:
+    """CachedListMixin for async views"""
+
+    versioned_models = ()
+    cache_timeout = CachedListMixin.cache_timeout
+
+    async def get_response(self, request, *args, **kwargs) -> HttpResponse:
+        versions = await aget_versions(*self.versioned_models)
+        key = CachedListMixin.get_list_cache_key(self, request, versions)
+        cached = await cache.aget(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        with primary_after_changes(versions):
+            response = self.render_response(
+                request, await super().get_response(request, *args, **kwargs)
+            )
+        if response.status_code == 200:
+            await cache.aset(
+                key,
+                (response.content, response["Content-Type"]),
+                self.cache_timeout,
+            )
+        return response
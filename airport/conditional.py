@@ -0,0 +1,139 @@
+import calendar
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from airport.cache import aget_versions, get_versions
+from airport_service.db.replica import primary_after_changes
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified support for list and retrieve.
+
+    Validators are computed from the versions of ``versioned_models`` and,
+    for a single object, its ``last_modified_field`` - never from the
+    response body - so matching If-None-Match / If-Modified-Since requests
+    get a 304 before the data is queried or serialized. There is no
+    Last-Modified while the newest change is in the current second.
+    Viewsets with a detail route wrap it with ``conditional_response``.
+    """
+
+    versioned_models = ()
+    last_modified_field = None
+    conditional_per_user = False
+
+    def get_validators(self, request, versions: tuple, pk=None):
+        last_modified = max(versions, default=0) // 1_000_000
+        parts = [
+            request.build_absolute_uri(),
+            request.accepted_renderer.format,
+            *map(str, versions),
+        ]
+
+        if self.conditional_per_user:
+            parts.append(str(request.user.pk))
+
+        if pk is not None and self.last_modified_field:
+            try:
+                updated_at = (
+                    self.get_queryset()
+                    .filter(pk=pk)
+                    .values_list(self.last_modified_field, flat=True)
+                    .first()
+                )
+            except (TypeError, ValueError, DjangoValidationError):
+                raise Http404
+            if updated_at is None:
+                return None
+            parts.append(updated_at.isoformat())
+            last_modified = max(
+                last_modified, calendar.timegm(updated_at.utctimetuple())
+            )
+
+        # Last-Modified has whole seconds: another change within the
+        # current second would keep it, and If-Modified-Since get a 304
+        if last_modified >= int(time.time()):
+            last_modified = None
+
+        etag = quote_etag(hashlib.md5("|".join(parts).encode()).hexdigest())
+        return etag, last_modified
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        versions = get_versions(*self.versioned_models)
+        # the validators and the response must come from the same data
+        with primary_after_changes(versions):
+            validators = self.get_validators(
+                request,
+                versions,
+                kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            )
+            if validators is None:
+                return handler(request, *args, **kwargs)
+
+            not_modified = self.get_not_modified(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
+            response = handler(request, *args, **kwargs)
+        return self.add_validators(response, *validators)
+
+    async def aconditional_response(self, request, handler, *args, **kwargs):
+        """conditional_response of async views"""
+        versions = await aget_versions(*self.versioned_models)
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        with primary_after_changes(versions):
+            if pk is not None and self.last_modified_field:
+                # reads the object
+                validators = await sync_to_async(self.get_validators)(
+                    request, versions, pk
+                )
+            else:
+                validators = self.get_validators(request, versions, pk)
+            if validators is None:
+                return await handler(request, *args, **kwargs)
+
+            not_modified = self.get_not_modified(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
+            response = await handler(request, *args, **kwargs)
+        return self.add_validators(response, *validators)
+
+    @staticmethod
+    def get_not_modified(request, etag: str, last_modified: int | None):
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+        return not_modified
+
+    @staticmethod
+    def add_validators(response, etag: str, last_modified: int | None):
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+
+class AsyncConditionalGetMixin(ConditionalGetMixin):
+    """ConditionalGetMixin for the ``get_response`` of async views"""
+
+    lookup_field = "pk"
+    lookup_url_kwarg = None
+
+    async def get_response(self, request, *args, **kwargs):
+        return await self.aconditional_response(
+            request, super().get_response, *args, **kwargs
+        )
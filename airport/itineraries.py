@@ -0,0 +1,206 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import NamedTuple
+
+from django.utils import timezone
+
+from airport.cache import ProcessLocalCache
+from airport.models import Airport, Route, Flight
+
+MAX_LEGS = 3
+MIN_LAYOVER = timedelta(minutes=60)
+MAX_LAYOVER = timedelta(hours=24)
+
+departure_key = attrgetter("departure_time")
+
+
+class Leg(NamedTuple):
+    flight_id: int
+    source_id: int
+    destination_id: int
+    distance: int
+    departure_time: datetime
+    arrival_time: datetime
+
+
+class RouteGraph:
+    """Airports as nodes and upcoming flights as time-dependent edges.
+
+    Legs must come ordered by departure time.
+    """
+
+    def __init__(self, legs, airport_names: dict, window_start) -> None:
+        self.airport_names = airport_names
+        self.window_start = window_start
+        self.departures = defaultdict(list)
+        self.direct = defaultdict(list)
+        self.predecessors = defaultdict(set)
+
+        for leg in legs:
+            self.departures[leg.source_id].append(leg)
+            self.direct[leg.source_id, leg.destination_id].append(leg)
+            self.predecessors[leg.destination_id].add(leg.source_id)
+
+    @staticmethod
+    def departing_between(legs: list[Leg], earliest, latest):
+        index = bisect_left(legs, earliest, key=departure_key)
+        while index < len(legs) and legs[index].departure_time < latest:
+            yield legs[index]
+            index += 1
+
+    def search(
+        self,
+        source: int,
+        destination: int,
+        earliest: datetime,
+        latest: datetime,
+        max_legs: int,
+        min_layover: timedelta = MIN_LAYOVER,
+    ) -> list[list[Leg]]:
+        """Every itinerary from source to destination with the first
+        flight departing in [earliest, latest) and feasible layovers"""
+        itineraries = []
+        predecessors = self.predecessors[destination]
+
+        def candidates(airport: int, legs_left: int) -> list[Leg]:
+            if legs_left == 1:
+                return self.direct[airport, destination]
+            return self.departures[airport]
+
+        def extend(path: list[Leg], visited: set) -> None:
+            last = path[-1]
+            if last.destination_id == destination:
+                itineraries.append(path)
+                return
+
+            legs_left = max_legs - len(path)
+            if legs_left == 0:
+                return
+
+            for leg in self.departing_between(
+                candidates(last.destination_id, legs_left),
+                last.arrival_time + min_layover,
+                last.arrival_time + MAX_LAYOVER,
+            ):
+                if leg.destination_id in visited:
+                    continue
+                if (
+                    legs_left == 2
+                    and leg.destination_id != destination
+                    and leg.destination_id not in predecessors
+                ):
+                    continue
+                extend(path + [leg], visited | {leg.destination_id})
+
+        for leg in self.departing_between(
+            candidates(source, max_legs), earliest, latest
+        ):
+            extend([leg], {source, leg.destination_id})
+
+        return itineraries
+
+
+def build_route_graph() -> RouteGraph:
+    window_start = timezone.now().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    legs = (
+        Flight.objects.filter(departure_time__gte=window_start)
+        .order_by("departure_time")
+        .values_list(
+            "id",
+            "route__source_id",
+            "route__destination_id",
+            "route__distance",
+            "departure_time",
+            "arrival_time",
+        )
+    )
+    return RouteGraph(
+        (Leg(*leg) for leg in legs),
+        dict(Airport.objects.values_list("id", "name")),
+        window_start,
+    )
+
+
+route_graph_cache = ProcessLocalCache(
+    build_route_graph, models=(Airport, Route, Flight)
+)
+
+
+def get_route_graph() -> RouteGraph:
+    """Cached graph of flights departing from today on"""
+    graph = route_graph_cache.get()
+    if graph.window_start.date() != timezone.now().date():
+        route_graph_cache.invalidate()
+        graph = route_graph_cache.get()
+    return graph
+
+
+def itinerary_to_dict(legs: list[Leg], airport_names: dict) -> dict:
+    return {
+        "departure_time": legs[0].departure_time,
+        "arrival_time": legs[-1].arrival_time,
+        "duration": int(
+            (legs[-1].arrival_time - legs[0].departure_time).total_seconds()
+            // 60
+        ),
+        "distance": sum(leg.distance for leg in legs),
+        "flights": [
+            {
+                "flight": leg.flight_id,
+                "route_source": airport_names.get(leg.source_id),
+                "route_destination": airport_names.get(leg.destination_id),
+                "departure_time": leg.departure_time,
+                "arrival_time": leg.arrival_time,
+            }
+            for leg in legs
+        ],
+    }
+
+
+def search_itineraries(
+    source: int,
+    destination: int,
+    date,
+    max_legs: int = 2,
+    min_layover: timedelta = MIN_LAYOVER,
+    order_by: str = "duration",
+    limit: int = 20,
+) -> list[dict]:
+    """Best itineraries departing on date, ranked by total duration or
+    distance (the other one breaks ties)"""
+    graph = get_route_graph()
+    earliest = datetime.combine(date, datetime.min.time())
+    itineraries = graph.search(
+        source,
+        destination,
+        earliest,
+        earliest + timedelta(days=1),
+        min(max_legs, MAX_LEGS),
+        min_layover,
+    )
+
+    def duration(legs: list[Leg]) -> timedelta:
+        return legs[-1].arrival_time - legs[0].departure_time
+
+    def distance(legs: list[Leg]) -> int:
+        return sum(leg.distance for leg in legs)
+
+    if order_by == "duration":
+        ranking = (duration, distance)
+    else:
+        ranking = (distance, duration)
+    itineraries.sort(
+        key=lambda legs: (
+            ranking[0](legs),
+            ranking[1](legs),
+            legs[0].departure_time,
+        )
+    )
+    return [
+        itinerary_to_dict(legs, graph.airport_names)
+        for legs in itineraries[:limit]
+    ]
@@ -0,0 +1,181 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.views import APIView
+
+from benchmarks import api, connections, seating, serializers
+from benchmarks.stats import change, load_results, measure, save_results
+
+SCENARIOS = (
+    api.SCENARIOS
+    + serializers.SCENARIOS
+    + seating.SCENARIOS
+    + connections.SCENARIOS
+)
+WRITE_SCENARIOS = api.WRITE_SCENARIOS + seating.WRITE_SCENARIOS
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Measure latency of the API hot paths on the current database "
+        "and compare it with the previous run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Scenarios to run, all by default: {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--tickets",
+            type=int,
+            default=6,
+            help="Tickets per order of the order_create_many scenario",
+        )
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=100,
+            help="Rows per call of the serializer scenarios",
+        )
+        parser.add_argument(
+            "--baseline",
+            default="benchmarks/baseline.json",
+            help="Results of the previous run, replaced by this run",
+        )
+        parser.add_argument(
+            "--no-save",
+            action="store_true",
+            help="Only compare, keep the baseline file as it is",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=None,
+            help="Fail when a p50 latency grew by more percent than this",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = options["scenarios"] or SCENARIOS
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1")
+        baseline = load_results(options["baseline"])
+        throttle_classes = APIView.throttle_classes
+        APIView.throttle_classes = ()
+        try:
+            with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                results = self.run(scenarios, options)
+        finally:
+            APIView.throttle_classes = throttle_classes
+
+        regressions = self.report(results, baseline)
+
+        if not options["no_save"]:
+            save_results(options["baseline"], {**baseline, **results})
+
+        limit = options["max_regression"]
+        if limit is not None:
+            regressed = [
+                name for name, growth in regressions.items() if growth > limit
+            ]
+            if regressed:
+                raise CommandError(
+                    f"p50 regressed by more than {limit}%: "
+                    + ", ".join(regressed)
+                )
+
+    def run(self, scenarios, options) -> dict:
+        results = {}
+        # nothing the scenarios write outlives the run
+        with transaction.atomic():
+            try:
+                api_benchmarks = api.ApiBenchmarks(tickets=options["tickets"])
+            except ValueError as error:
+                raise CommandError(error)
+            serializer_benchmarks = serializers.SerializerBenchmarks(
+                rows=options["rows"]
+            )
+            seating_benchmarks = seating.SeatingBenchmarks(
+                api_benchmarks.client
+            )
+            connection_benchmarks = connections.ConnectionBenchmarks()
+
+            for name in scenarios:
+                if name in api.SCENARIOS:
+                    call = api_benchmarks.get_scenario(name)
+                elif name in seating.SCENARIOS:
+                    call = seating_benchmarks.get_scenario(name)
+                elif name in connections.SCENARIOS:
+                    call = connection_benchmarks.get_scenario(name)
+                else:
+                    call = serializer_benchmarks.get_scenario(name)
+                if name in WRITE_SCENARIOS:
+                    call = self.rolled_back(call)
+                results[name] = measure(
+                    call, options["iterations"], options["warmup"]
+                )
+                results[name]["database"] = connection.vendor
+                if name in serializers.SCENARIOS:
+                    rows = serializer_benchmarks.page_size(
+                        name.split("_", 1)[0]
+                    )
+                    results[name]["per_row_us"] = round(
+                        results[name]["p50"] * 1000 / rows, 2
+                    )
+            connection_benchmarks.close()
+            transaction.set_rollback(True)
+        return results
+
+    @staticmethod
+    def rolled_back(call):
+        def wrapper() -> None:
+            with transaction.atomic():
+                call()
+                transaction.set_rollback(True)
+
+        return wrapper
+
+    def report(self, results: dict, baseline: dict) -> dict:
+        self.stdout.write(
+            f"{'scenario':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'req/s':>10}{'p50 change':>12}"
+        )
+        regressions = {}
+        for name, result in results.items():
+            previous = baseline.get(name, {})
+            # timings of another database engine are not comparable
+            if previous.get("database", result["database"]) != (
+                result["database"]
+            ):
+                previous = {}
+            growth = change(result["p50"], previous.get("p50"))
+            line = (
+                f"{name:<28}{result['p50']:>10}{result['p95']:>10}"
+                f"{result['p99']:>10}{result['throughput']:>10}"
+                f"{'' if growth is None else f'{growth:+}%':>12}"
+            )
+            if growth is None:
+                self.stdout.write(line)
+            else:
+                regressions[name] = growth
+                style = (
+                    self.style.ERROR if growth > 0 else self.style.SUCCESS
+                )
+                self.stdout.write(style(line))
+
+        for name, result in results.items():
+            if "per_row_us" in result:
+                self.stdout.write(
+                    f"{name}: {result['per_row_us']} us per row"
+                )
+        return regressions
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.views import APIView
+
+from airport_service.async_views import AsyncAPIView
+from benchmarks.concurrency import MODES, SCENARIOS, ConcurrencyBenchmarks
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Compare the sync and async read endpoints under concurrent "
+        "requests to the ASGI application"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Scenarios to run, all by default: {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=50,
+            help="Requests in flight at the same time",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = options["scenarios"] or SCENARIOS
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+        try:
+            benchmarks = ConcurrencyBenchmarks(options["concurrency"])
+        except ValueError as error:
+            raise CommandError(error)
+
+        throttle_classes = APIView.throttle_classes
+        async_throttle_classes = AsyncAPIView.throttle_classes
+        APIView.throttle_classes = AsyncAPIView.throttle_classes = ()
+        try:
+            with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                self.stdout.write(
+                    f"{'scenario':<28}{'p50 ms':>10}{'p95 ms':>10}"
+                    f"{'p99 ms':>10}{'req/s':>10}"
+                )
+                for name in scenarios:
+                    for mode in MODES:
+                        result = benchmarks.run(
+                            name, mode, options["requests"], options["warmup"]
+                        )
+                        self.stdout.write(
+                            f"{f'{name}_{mode}':<28}{result['p50']:>10}"
+                            f"{result['p95']:>10}{result['p99']:>10}"
+                            f"{result['throughput']:>10}"
+                        )
+        finally:
+            APIView.throttle_classes = throttle_classes
+            AsyncAPIView.throttle_classes = async_throttle_classes
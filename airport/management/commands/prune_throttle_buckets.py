@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from airport_service.throttling import prune_idle_buckets
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Delete the token buckets of the database throttle store that "
+        "have been idle long enough to be full again"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = 0
+        while True:
+            batch = prune_idle_buckets(options["batch_size"])
+            if not batch:
+                break
+            deleted += batch
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} idle throttle buckets")
+        )
@@ -0,0 +1,46 @@
+from django.core.management import BaseCommand
+
+from airport.models import Flight
+from airport.seat_map import rebuild_seat_maps
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Rebuild flight seat maps and tickets_sold / tickets_held "
+        "counters from the actual tickets and seat holds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "flight_ids",
+            nargs="*",
+            type=int,
+            help="Flights to reconcile (all flights by default)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        flight_ids = options["flight_ids"] or list(
+            Flight.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        batch_size = options["batch_size"]
+        fixed = 0
+
+        for start in range(0, len(flight_ids), batch_size):
+            batch_fixed, out_of_range = rebuild_seat_maps(
+                flight_ids[start:start + batch_size]
+            )
+            fixed += batch_fixed
+            for flight_id, row, seat in out_of_range:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Flight {flight_id}: row {row}, seat {seat} "
+                        "is not on its airplane"
+                    )
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled {len(flight_ids)} flights, {fixed} fixed"
+            )
+        )
@@ -0,0 +1,344 @@
+import csv
+import io
+import random
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from airport.cache import bump_version
+from airport.models import (
+    AirplaneType,
+    Airplane,
+    Airport,
+    Crew,
+    Location,
+    Route,
+    Flight,
+)
+from airport.seat_map import SeatMap
+from order.models import Order, Ticket
+
+SYLLABLES = (
+    "an", "bar", "cel", "dor", "el", "fa", "gra", "hel", "is", "ka",
+    "lon", "mar", "no", "or", "pra", "ri", "sa", "tor", "ul", "va",
+    "wes", "yor", "zen",
+)
+FIRST_NAMES = (
+    "Anna", "Boris", "Chen", "Daria", "Emil", "Fatima", "Gustav", "Hana",
+    "Ivan", "Julia", "Kofi", "Lena", "Marco", "Nora", "Omar", "Petra",
+)
+AIRPLANE_TYPES = ("Airbus", "Boeing", "Embraer", "Bombardier", "ATR")
+# (rows, seats in row) of typical narrow and wide body layouts
+AIRPLANE_LAYOUTS = ((12, 4), (20, 4), (25, 6), (30, 6), (38, 6), (45, 9))
+# passengers per order and how often such a party books
+PARTY_SIZES = (1, 2, 3, 4, 5)
+PARTY_WEIGHTS = (45, 30, 10, 12, 3)
+CRUISE_SPEED = 800
+
+
+def copy_rows(model, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    """Insert plain tuples into the table of model, bypassing the ORM.
+
+    PostgreSQL gets the rows through COPY, other databases through
+    executemany.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    column_list = ", ".join(map(quote, columns))
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table} ({column_list}) FROM STDIN WITH CSV", buffer
+            )
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {table} ({column_list}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Generate a large deterministic data set for load tests "
+        "and benchmarks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--locations", type=int, default=200)
+        parser.add_argument("--airports", type=int, default=300)
+        parser.add_argument("--routes", type=int, default=2000)
+        parser.add_argument("--airplanes", type=int, default=200)
+        parser.add_argument("--crews", type=int, default=1000)
+        parser.add_argument("--flights", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--fill",
+            type=float,
+            default=0.75,
+            help="Mean share of sold seats per flight",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Flights depart within this many days from --start-date",
+        )
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            default=None,
+            help="First departure day, today by default",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            locations = self.create_locations(options["locations"])
+            airports = self.create_airports(options["airports"], locations)
+            routes = self.create_routes(options["routes"], airports)
+            airplanes = self.create_airplanes(options["airplanes"])
+            crews = self.create_crews(options["crews"])
+            users = self.create_users(options["users"], options["seed"])
+
+        start = datetime.combine(
+            options["start_date"] or date.today(), datetime.min.time()
+        )
+        tickets = 0
+        for created in range(0, options["flights"], self.batch_size):
+            size = min(self.batch_size, options["flights"] - created)
+            with transaction.atomic():
+                tickets += self.create_flights(
+                    size,
+                    routes,
+                    airplanes,
+                    crews,
+                    users,
+                    start,
+                    options["days"],
+                    options["fill"],
+                )
+            self.stdout.write(f"Flights: {created + size}, tickets: {tickets}")
+
+        # bulk inserts skip the signals invalidating the caches
+        for model in (
+            AirplaneType,
+            Airplane,
+            Airport,
+            Crew,
+            Location,
+            Route,
+            Flight,
+            Order,
+            Ticket,
+        ):
+            bump_version(model)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {options['flights']} flights "
+                f"and {tickets} tickets"
+            )
+        )
+
+    def name(self, syllables: int = 3) -> str:
+        return "".join(
+            self.random.choice(SYLLABLES) for _ in range(syllables)
+        ).capitalize()
+
+    def create_locations(self, count: int) -> list[Location]:
+        countries = [self.name(2) for _ in range(max(count // 10, 1))]
+        return Location.objects.bulk_create(
+            (
+                Location(
+                    city=self.name(), country=self.random.choice(countries)
+                )
+                for _ in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_airports(
+        self, count: int, locations: list[Location]
+    ) -> list[Airport]:
+        return Airport.objects.bulk_create(
+            (
+                Airport(
+                    name=f"{self.name()} {self.name(2)}",
+                    location=self.random.choice(locations),
+                )
+                for _ in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_routes(self, count: int, airports: list[Airport]) -> list:
+        # a few hubs get most of the traffic, as in real networks
+        weights = [1 / rank for rank in range(1, len(airports) + 1)]
+        routes = []
+        for _ in range(count):
+            source, destination = self.random.choices(
+                airports, weights=weights, k=2
+            )
+            while destination == source:
+                destination = self.random.choice(airports)
+            routes.append(
+                Route(
+                    source=source,
+                    destination=destination,
+                    distance=self.random.randint(150, 9000),
+                )
+            )
+        return Route.objects.bulk_create(routes, batch_size=self.batch_size)
+
+    def create_airplanes(self, count: int) -> list[Airplane]:
+        airplane_types = AirplaneType.objects.bulk_create(
+            AirplaneType(name=name) for name in AIRPLANE_TYPES
+        )
+        airplanes = []
+        for index in range(count):
+            rows, seats_in_row = self.random.choice(AIRPLANE_LAYOUTS)
+            airplane_type = self.random.choice(airplane_types)
+            airplanes.append(
+                Airplane(
+                    name=f"{airplane_type.name} {index + 1}",
+                    rows=rows,
+                    seats_in_row=seats_in_row,
+                    airplane_type=airplane_type,
+                )
+            )
+        return Airplane.objects.bulk_create(
+            airplanes, batch_size=self.batch_size
+        )
+
+    def create_crews(self, count: int) -> list[Crew]:
+        return Crew.objects.bulk_create(
+            (
+                Crew(
+                    first_name=self.random.choice(FIRST_NAMES),
+                    last_name=self.name(),
+                )
+                for _ in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+
+    def create_users(self, count: int, seed: int) -> list[int]:
+        # hashing is slow on purpose, so every user shares one password
+        password = make_password("password")
+        email_domain = f"seed{seed}.example.com"
+        get_user_model().objects.bulk_create(
+            (
+                get_user_model()(
+                    email=f"user{index}@{email_domain}", password=password
+                )
+                for index in range(count)
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return list(
+            get_user_model()
+            .objects.filter(email__endswith=f"@{email_domain}")
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+    def create_flights(
+        self,
+        count: int,
+        routes: list[Route],
+        airplanes: list[Airplane],
+        crews: list[Crew],
+        users: list[int],
+        start: datetime,
+        days: int,
+        fill: float,
+    ) -> int:
+        flights = []
+        seat_maps = []
+        for _ in range(count):
+            route = self.random.choice(routes)
+            airplane = self.random.choice(airplanes)
+            departure_time = start + timedelta(
+                minutes=5 * self.random.randrange(days * 24 * 12)
+            )
+            duration = timedelta(
+                minutes=30 + route.distance * 60 // CRUISE_SPEED
+            )
+            seat_map = SeatMap(airplane.rows, airplane.seats_in_row)
+            parties = self.book_parties(seat_map, fill) if users else []
+            flights.append(
+                Flight(
+                    route=route,
+                    airplane=airplane,
+                    departure_time=departure_time,
+                    arrival_time=departure_time + duration,
+                    seat_map=seat_map.to_bytes(),
+                    tickets_sold=sum(map(len, parties)),
+                )
+            )
+            seat_maps.append(parties)
+
+        Flight.objects.bulk_create(flights)
+        copy_rows(
+            Flight.crew.through,
+            ("flight_id", "crew_id"),
+            [
+                (flight.pk, crew.pk)
+                for flight in flights
+                for crew in self.random.sample(crews, min(len(crews), 4))
+            ],
+        )
+
+        orders = []
+        order_seats = []
+        for flight, parties in zip(flights, seat_maps):
+            for party in parties:
+                orders.append(Order(user_id=self.random.choice(users)))
+                order_seats.append((flight, party))
+        Order.objects.bulk_create(orders, batch_size=self.batch_size)
+
+        tickets = [
+            (order.pk, flight.pk, row, seat)
+            for order, (flight, party) in zip(orders, order_seats)
+            for row, seat in party
+        ]
+        copy_rows(Ticket, ("order_id", "flight_id", "row", "seat"), tickets)
+        return len(tickets)
+
+    def book_parties(self, seat_map: SeatMap, fill: float) -> list[list]:
+        """Seats of the parties booked on a flight, marked in seat_map.
+
+        The fill rate of a flight follows a beta distribution around
+        ``fill``, and parties sit next to each other where possible.
+        """
+        fill = min(max(fill, 0.01), 0.99)
+        sold = int(
+            seat_map.capacity
+            * self.random.betavariate(fill * 8, (1 - fill) * 8)
+        )
+        seats = sorted(self.random.sample(range(seat_map.capacity), sold))
+        parties = []
+        index = 0
+        while index < len(seats):
+            size = self.random.choices(PARTY_SIZES, PARTY_WEIGHTS)[0]
+            party = []
+            for position in seats[index:index + size]:
+                row, seat = divmod(position, seat_map.seats_in_row)
+                seat_map.take(row + 1, seat + 1)
+                party.append((row + 1, seat + 1))
+            parties.append(party)
+            index += size
+        return parties
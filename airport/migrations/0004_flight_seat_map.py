@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+def fill_seat_maps(apps, schema_editor):
+    from airport.seat_map import SeatMap
+
+    Flight = apps.get_model("airport", "Flight")
+    Ticket = apps.get_model("order", "Ticket")
+
+    for flight in Flight.objects.select_related("airplane").iterator():
+        seat_map = SeatMap(
+            flight.airplane.rows, flight.airplane.seats_in_row
+        )
+        for row, seat in Ticket.objects.filter(flight=flight).values_list(
+            "row", "seat"
+        ):
+            seat_map.take(row, seat)
+        flight.seat_map = seat_map.to_bytes()
+        flight.save(update_fields=["seat_map"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0003_route_distance"),
+        ("order", "0003_alter_ticket_options_alter_ticket_unique_together"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="seat_map",
+            field=models.BinaryField(default=b"", editable=False),
+        ),
+        migrations.RunPython(fill_seat_maps, migrations.RunPython.noop),
+    ]
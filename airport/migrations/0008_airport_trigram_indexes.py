@@ -0,0 +1,43 @@
+# Generated by Django 5.0 on 2026-10-18 14:00
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_INDEXES = (
+    ("Airport", "name", "airport_name_trgm_idx"),
+    ("Location", "city", "location_city_trgm_idx"),
+    ("Location", "country", "location_country_trgm_idx"),
+)
+
+
+def trigram_indexes(apps):
+    for model_name, field, name in TRIGRAM_INDEXES:
+        yield apps.get_model("airport", model_name), GinIndex(
+            fields=[field], name=name, opclasses=["gin_trgm_ops"]
+        )
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model, index in trigram_indexes(apps):
+        schema_editor.add_index(model, index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model, index in trigram_indexes(apps):
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0007_flight_route_departure_idx_and_more"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
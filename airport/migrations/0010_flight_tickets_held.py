@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0009_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="tickets_held",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
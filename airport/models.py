@@ -26,6 +26,7 @@ class Airport(models.Model):
         to=Location, on_delete=models.CASCADE, related_name="airports"
     )
     image = models.ImageField(null=True, upload_to=airport_image_file_path)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return f"{self.name}({self.location.city})"
@@ -39,6 +40,15 @@ class Route(models.Model):
         to=Airport, on_delete=models.CASCADE, related_name="end_of_route"
     )
     distance = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["source", "destination"],
+                name="route_source_destination_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.source} - {self.destination}"
@@ -89,9 +99,52 @@ class Flight(models.Model):
     crew = models.ManyToManyField(to=Crew, related_name="flights")
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    seat_map = models.BinaryField(default=b"", editable=False)
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
+    tickets_held = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-departure_time"]
+        indexes = [
+            models.Index(
+                fields=["departure_time", "id"],
+                name="flight_departure_id_idx",
+            ),
+            models.Index(
+                fields=["route", "departure_time"],
+                name="flight_route_departure_idx",
+            ),
+        ]
+
+    # changed only under the flight's row lock, see airport.seat_map
+    SEAT_FIELDS = ("seat_map", "tickets_sold", "tickets_held")
+
+    @property
+    def tickets_available(self) -> int:
+        return self.airplane.capacity - self.tickets_sold - self.tickets_held
+
+    def save(
+        self,
+        force_insert=False,
+        force_update=False,
+        using=None,
+        update_fields=None,
+    ):
+        """Updates leave the seat fields alone, the instance may be older
+        than bookings made since it was loaded"""
+        if update_fields is None and not (
+            force_insert or self._state.adding
+        ):
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.SEAT_FIELDS
+            ]
+        return super(Flight, self).save(
+            force_insert, force_update, using, update_fields
+        )
 
     def __str__(self) -> str:
         return (
@@ -0,0 +1,219 @@
+import base64
+import json
+from collections import OrderedDict, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple("Cursor", ["position", "reverse"])
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a unique composite sort key.
+
+    The cursor carries the whole sort key of the boundary row, so every
+    page is a single range scan on the matching index, however deep it is.
+    ``ordering`` must end with a unique field (usually ``id``).
+    """
+
+    ordering = None
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None) -> list:
+        return self.get_page(list(self.get_window(queryset, request)))
+
+    def get_window(self, queryset: QuerySet, request) -> QuerySet:
+        """Ordered and filtered slice for the requested page.
+
+        Evaluating it is the only query pagination makes, which lets
+        callers fetch the rows however they like before calling get_page.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        queryset = queryset.order_by(*self.get_ordering(reverse))
+        if self.cursor is not None:
+            position = self.get_cursor_values(
+                queryset.model, self.cursor.position
+            )
+            queryset = queryset.filter(
+                self.get_keyset_filter(position, reverse)
+            )
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, rows: list) -> list:
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_ordering(self, reverse: bool = False) -> list[str]:
+        if not reverse:
+            return list(self.ordering)
+        return [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+
+    def get_keyset_filter(self, position: list, reverse: bool) -> Q:
+        keyset_filter = Q()
+        equal = {}
+        for field, value in zip(self.get_ordering(reverse), position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            keyset_filter |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return keyset_filter
+
+    def get_page_size(self, request) -> int:
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_position(self, row) -> list:
+        position = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position = data["p"]
+            reverse = bool(data.get("r"))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(position=position, reverse=reverse)
+
+    def get_cursor_values(self, model, position: list) -> list:
+        """Values of the ordering fields in a cursor position, a forged
+        cursor is not found instead of failing in the database"""
+        values = []
+        for field, value in zip(self.ordering, position):
+            try:
+                value = model._meta.get_field(field.lstrip("-")).to_python(
+                    value
+                )
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, cursor: Cursor) -> str:
+        data = {"p": cursor.position}
+        if cursor.reverse:
+            data["r"] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(data, separators=(",", ":")).encode()
+        ).decode("ascii")
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(
+            Cursor(position=self.get_position(self.page[-1]), reverse=False)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(
+            Cursor(position=self.get_position(self.page[0]), reverse=True)
+        )
+
+    def get_paginated_response(self, data) -> Response:
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema) -> dict:
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {
+                    "type": "string",
+                    "nullable": True,
+                    "format": "uri",
+                },
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view) -> list[dict]:
+        parameters = [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            }
+        ]
+        if self.page_size_query_param:
+            parameters.append(
+                {
+                    "name": self.page_size_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": "Number of results to return per page.",
+                    "schema": {"type": "integer"},
+                }
+            )
+        return parameters
@@ -0,0 +1,95 @@
+import re
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections, router
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Greatest
+
+from airport.models import Airport, Location
+
+# pg_trgm's default pg_trgm.word_similarity_threshold, used by the
+# ``trigram_word_similar`` (<%) lookup that the GIN indexes serve
+SIMILARITY_THRESHOLD = 0.6
+SEARCH_FIELDS = ("name", "location__city", "location__country")
+
+
+def trigrams(text: str) -> set[str]:
+    """Trigrams of every word padded the way pg_trgm does it"""
+    result = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        result.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return result
+
+
+def word_similarity(query: str, text: str) -> float:
+    """Share of the query trigrams found in text (like pg word_similarity)"""
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return 0.0
+    return len(query_trigrams & trigrams(text)) / len(query_trigrams)
+
+
+def trigram_matches(query: str) -> QuerySet:
+    """Airports matching the query through the PostgreSQL trigram indexes"""
+    locations = Location.objects.filter(
+        Q(city__trigram_word_similar=query)
+        | Q(country__trigram_word_similar=query)
+    )
+    return Airport.objects.filter(
+        Q(name__trigram_word_similar=query) | Q(location__in=locations)
+    )
+
+
+def search_airports(query: str, limit: int | None = 10) -> list[Airport]:
+    """Airports whose name, city or country fuzzily match the query.
+
+    Results are ranked by similarity, stored on each airport as
+    ``similarity``. PostgreSQL uses the trigram GIN indexes, other
+    databases (SQLite in tests) are searched in process.
+    """
+    queryset = Airport.objects.select_related("location")
+    connection = connections[router.db_for_read(Airport)]
+
+    if connection.vendor == "postgresql":
+        return list(
+            trigram_matches(query)
+            .select_related("location")
+            .annotate(
+                similarity=Greatest(
+                    *(
+                        TrigramWordSimilarity(query, field)
+                        for field in SEARCH_FIELDS
+                    )
+                )
+            )
+            .order_by("-similarity", "name")[:limit]
+        )
+
+    airports = []
+    for airport in queryset:
+        airport.similarity = max(
+            word_similarity(query, text)
+            for text in (
+                airport.name,
+                airport.location.city,
+                airport.location.country,
+            )
+        )
+        if airport.similarity >= SIMILARITY_THRESHOLD:
+            airports.append(airport)
+    airports.sort(key=lambda airport: (-airport.similarity, airport.name))
+    return airports[:limit]
+
+
+def matching_airport_ids(query: str) -> QuerySet | list[int]:
+    """IDs of every airport matching the query, unranked and unlimited.
+
+    On PostgreSQL this is a subquery, so filtering flights by it stays a
+    single query however many airports match.
+    """
+    if connections[router.db_for_read(Airport)].vendor == "postgresql":
+        return trigram_matches(query).values("id")
+    return [airport.id for airport in search_airports(query, limit=None)]
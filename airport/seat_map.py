@@ -0,0 +1,247 @@
+import base64
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from airport.models import Flight
+from order.models import SeatHold, Ticket
+
+
+class SeatMap:
+    """Seat occupancy of a flight packed into a bitmap.
+
+    Seat (row, seat) maps to bit ``(row - 1) * seats_in_row + (seat - 1)``,
+    bits are stored least significant first within each byte.
+    """
+
+    def __init__(self, rows: int, seats_in_row: int, data=b"") -> None:
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        self._bits = bytearray(bytes(data or b""))
+        size = (self.capacity + 7) // 8
+        if len(self._bits) < size:
+            self._bits.extend(bytes(size - len(self._bits)))
+        del self._bits[size:]
+
+    @classmethod
+    def for_flight(cls, flight: Flight) -> "SeatMap":
+        return cls(
+            flight.airplane.rows,
+            flight.airplane.seats_in_row,
+            flight.seat_map,
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.rows * self.seats_in_row
+
+    @property
+    def taken_count(self) -> int:
+        return sum(byte.bit_count() for byte in self._bits)
+
+    @property
+    def free_count(self) -> int:
+        return self.capacity - self.taken_count
+
+    def _position(self, row: int, seat: int) -> tuple[int, int]:
+        if not (
+            1 <= row <= self.rows and 1 <= seat <= self.seats_in_row
+        ):
+            raise IndexError(f"Seat ({row}, {seat}) is out of range")
+        index = (row - 1) * self.seats_in_row + (seat - 1)
+        return index // 8, 1 << (index % 8)
+
+    def is_taken(self, row: int, seat: int) -> bool:
+        byte, mask = self._position(row, seat)
+        return bool(self._bits[byte] & mask)
+
+    def take(self, row: int, seat: int) -> None:
+        byte, mask = self._position(row, seat)
+        self._bits[byte] |= mask
+
+    def release(self, row: int, seat: int) -> None:
+        byte, mask = self._position(row, seat)
+        self._bits[byte] &= ~mask
+
+    def taken_places(self) -> list[dict]:
+        places = []
+        for byte_index, byte in enumerate(self._bits):
+            while byte:
+                lowest = byte & -byte
+                index = byte_index * 8 + lowest.bit_length() - 1
+                places.append(
+                    {
+                        "row": index // self.seats_in_row + 1,
+                        "seat": index % self.seats_in_row + 1,
+                    }
+                )
+                byte ^= lowest
+        return places
+
+    def find_adjacent(self, count: int) -> list[tuple[int, int]] | None:
+        """Best free seats for a group of ``count`` passengers.
+
+        The front-most row with ``count`` adjacent free seats wins,
+        otherwise the seats come from the fewest neighbouring rows.
+        None when there are not enough free seats.
+        """
+        if count < 1 or count > self.free_count:
+            return None
+
+        taken = int.from_bytes(self._bits, "little")
+        row_mask = (1 << self.seats_in_row) - 1
+        free_rows = [
+            ~(taken >> (row * self.seats_in_row)) & row_mask
+            for row in range(self.rows)
+        ]
+
+        if count <= self.seats_in_row:
+            for row, free in enumerate(free_rows):
+                # bit i stays set when seats i ... i + count - 1 are free
+                starts = free
+                for _ in range(count - 1):
+                    starts &= starts >> 1
+                if starts:
+                    first = (starts & -starts).bit_length()
+                    return [
+                        (row + 1, seat)
+                        for seat in range(first, first + count)
+                    ]
+
+        # shortest window of neighbouring rows with enough free seats
+        free_counts = [free.bit_count() for free in free_rows]
+        best = None
+        start = total = 0
+        for end, free_count in enumerate(free_counts):
+            total += free_count
+            while total - free_counts[start] >= count:
+                total -= free_counts[start]
+                start += 1
+            if total >= count and (
+                best is None or end - start < best[1] - best[0]
+            ):
+                best = (start, end)
+
+        seats = []
+        for row in range(best[0], best[1] + 1):
+            free = free_rows[row]
+            while free and len(seats) < count:
+                lowest = free & -free
+                seats.append((row + 1, lowest.bit_length()))
+                free ^= lowest
+        return seats
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)
+
+    def encode(self) -> str:
+        return base64.b64encode(self._bits).decode("ascii")
+
+
+def update_flight_seat_map(
+    flight_id: int,
+    taken: Iterable[tuple[int, int]] = (),
+    released: Iterable[tuple[int, int]] = (),
+    sold: int = 0,
+    held: int = 0,
+) -> None:
+    """Mark seats of a flight as taken or released under a row lock.
+
+    ``sold`` and ``held`` are added to the flight's tickets_sold and
+    tickets_held counters in the same UPDATE, so the bitmap and the
+    counters never drift apart.
+    """
+    with transaction.atomic():
+        flight = (
+            Flight.objects.select_for_update(of=("self",))
+            .select_related("airplane")
+            .filter(pk=flight_id)
+            .first()
+        )
+        if flight is None:
+            return
+
+        seat_map = SeatMap.for_flight(flight)
+        for row, seat in taken:
+            seat_map.take(row, seat)
+        for row, seat in released:
+            seat_map.release(row, seat)
+
+        Flight.objects.filter(pk=flight_id).update(
+            seat_map=seat_map.to_bytes(),
+            tickets_sold=F("tickets_sold") + sold,
+            tickets_held=F("tickets_held") + held,
+            updated_at=timezone.now(),
+        )
+
+
+def booked_seats(flight_ids) -> Iterable[tuple[int, int, int, bool]]:
+    """(flight id, row, seat, sold) of every ticket and held seat"""
+    tickets = Ticket.objects.filter(flight_id__in=flight_ids).values_list(
+        "flight_id", "row", "seat"
+    )
+    for flight_id, row, seat in tickets:
+        yield flight_id, row, seat, True
+
+    holds = SeatHold.objects.filter(flight_id__in=flight_ids).values_list(
+        "flight_id", "seats"
+    )
+    for flight_id, seats in holds:
+        for seat in seats:
+            yield flight_id, seat["row"], seat["seat"], False
+
+
+def rebuild_seat_maps(
+    flight_ids,
+) -> tuple[int, list[tuple[int, int, int]]]:
+    """Rebuild seat maps and tickets_sold / tickets_held counters of the
+    flights from their tickets and seat holds.
+
+    Returns the number of flights that changed, and the booked seats
+    that do not exist on the flight's airplane. Those are counted but
+    left out of the seat map.
+    """
+    fixed = 0
+    out_of_range = []
+    with transaction.atomic():
+        flights = (
+            Flight.objects.select_for_update(of=("self",))
+            .select_related("airplane")
+            .filter(pk__in=flight_ids)
+            .order_by("pk")
+        )
+        seat_maps = {
+            flight.pk: (
+                flight,
+                SeatMap(flight.airplane.rows, flight.airplane.seats_in_row),
+            )
+            for flight in flights
+        }
+        sold = dict.fromkeys(seat_maps, 0)
+        held = dict.fromkeys(seat_maps, 0)
+        for flight_id, row, seat, is_sold in booked_seats(list(seat_maps)):
+            if is_sold:
+                sold[flight_id] += 1
+            else:
+                held[flight_id] += 1
+            try:
+                seat_maps[flight_id][1].take(row, seat)
+            except IndexError:
+                out_of_range.append((flight_id, row, seat))
+
+        for flight_id, (flight, seat_map) in seat_maps.items():
+            if (
+                bytes(flight.seat_map) != seat_map.to_bytes()
+                or flight.tickets_sold != sold[flight_id]
+                or flight.tickets_held != held[flight_id]
+            ):
+                Flight.objects.filter(pk=flight_id).update(
+                    seat_map=seat_map.to_bytes(),
+                    tickets_sold=sold[flight_id],
+                    tickets_held=held[flight_id],
+                    updated_at=timezone.now(),
+                )
+                fixed += 1
+    return fixed, out_of_range
@@ -1,3 +1,5 @@
+from django.db.models import F
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from airport.models import (
@@ -9,6 +11,8 @@ from airport.models import (
     Route,
     Flight,
 )
+from airport.seat_map import SeatMap, booked_seats
+from airport.values import ValuesSerializer
 from order.models import Ticket
 
 
@@ -57,6 +61,37 @@ class AirportListSerializer(AirportSerializer):
         fields = ("id", "name", "location", "image")
 
 
+class AirportListValuesSerializer(ValuesSerializer):
+    serializer_class = AirportListSerializer
+    fields = {
+        "id": "id",
+        "name": "name",
+        "location": {
+            "id": "location__id",
+            "city": "location__city",
+            "country": "location__country",
+        },
+        "image": "image",
+    }
+
+
+class AirportSearchSerializer(AirportListSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Airport
+        fields = ("id", "name", "location", "image", "similarity")
+
+
+class AirportAutocompleteSerializer(serializers.ModelSerializer):
+    city = serializers.CharField(source="location.city", read_only=True)
+    country = serializers.CharField(source="location.country", read_only=True)
+
+    class Meta:
+        model = Airport
+        fields = ("id", "name", "city", "country")
+
+
 class AirportImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Airport
@@ -84,7 +119,37 @@ class RouteListSerializer(RouteSerializer):
     )
 
 
+class RouteListValuesSerializer(ValuesSerializer):
+    serializer_class = RouteListSerializer
+    fields = {
+        "id": "id",
+        "source": "source__name",
+        "destination": "destination__name",
+        "distance": "distance",
+    }
+
+
 class FlightSerializer(serializers.ModelSerializer):
+    def validate(self, attrs) -> dict:
+        data = super(FlightSerializer, self).validate(attrs=attrs)
+        airplane = data.get("airplane")
+        if self.instance is None or airplane is None:
+            return data
+
+        # the booked seats must exist on a new airplane
+        for _, row, seat, _ in booked_seats([self.instance.pk]):
+            if not (
+                1 <= row <= airplane.rows
+                and 1 <= seat <= airplane.seats_in_row
+            ):
+                raise serializers.ValidationError(
+                    {
+                        "airplane": "The flight has tickets or held seats "
+                        "that are not on this airplane"
+                    }
+                )
+        return data
+
     class Meta:
         model = Flight
         fields = (
@@ -118,6 +183,28 @@ class FlightListSerializer(FlightSerializer):
         )
 
 
+def tickets_available(flight: str = "") -> F:
+    """Flight.tickets_available as an expression"""
+    return (
+        F(f"{flight}airplane__rows") * F(f"{flight}airplane__seats_in_row")
+        - F(f"{flight}tickets_sold")
+        - F(f"{flight}tickets_held")
+    )
+
+
+class FlightListValuesSerializer(ValuesSerializer):
+    serializer_class = FlightListSerializer
+    fields = {
+        "id": "id",
+        "route_source": "route__source__name",
+        "route_destination": "route__destination__name",
+        "departure_time": "departure_time",
+        "arrival_time": "arrival_time",
+        "tickets_available": "tickets_available",
+    }
+    annotations = {"tickets_available": tickets_available()}
+
+
 class TicketSeatsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
@@ -128,9 +215,7 @@ class FlightDetailSerializer(FlightSerializer):
     route = RouteListSerializer(many=False, read_only=True)
     airplane = AirplaneListSerializer(many=False, read_only=True)
     crew = CrewSerializer(many=True, read_only=True)
-    taken_places = TicketSeatsSerializer(
-        source="tickets", many=True, read_only=True
-    )
+    taken_places = serializers.SerializerMethodField()
 
     class Meta:
         model = Flight
@@ -143,3 +228,31 @@ class FlightDetailSerializer(FlightSerializer):
             "arrival_time",
             "taken_places",
         )
+
+    @extend_schema_field(TicketSeatsSerializer(many=True))
+    def get_taken_places(self, obj: Flight) -> list[dict]:
+        return SeatMap.for_flight(obj).taken_places()
+
+
+class FlightSeatMapSerializer(serializers.Serializer):
+    rows = serializers.IntegerField()
+    seats_in_row = serializers.IntegerField()
+    taken = serializers.IntegerField(source="taken_count")
+    free = serializers.IntegerField(source="free_count")
+    seat_map = serializers.CharField(source="encode")
+
+
+class ItineraryFlightSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    route_source = serializers.CharField()
+    route_destination = serializers.CharField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+
+
+class ItinerarySerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    duration = serializers.IntegerField(help_text="Total minutes")
+    distance = serializers.IntegerField()
+    flights = ItineraryFlightSerializer(many=True)
@@ -0,0 +1,97 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from airport.cache import bump_version
+from airport.models import (
+    AirplaneType,
+    Airplane,
+    Airport,
+    Crew,
+    Location,
+    Route,
+    Flight,
+)
+from airport.seat_map import rebuild_seat_maps
+
+VERSIONED_MODELS = (
+    AirplaneType,
+    Airplane,
+    Airport,
+    Crew,
+    Location,
+    Route,
+    Flight,
+)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version(sender, **kwargs) -> None:
+    """Invalidate cached data of the model once the write is committed"""
+    if sender in VERSIONED_MODELS:
+        transaction.on_commit(partial(bump_version, sender))
+
+
+@receiver(m2m_changed, sender=Flight.crew.through)
+def touch_flight_crew(sender, instance, action, reverse, pk_set, **kwargs):
+    """Crew changes are part of the flight detail"""
+    if not action.startswith("post_"):
+        return
+
+    if reverse:
+        flight_ids = pk_set or ()
+    else:
+        flight_ids = [instance.pk]
+    Flight.objects.filter(pk__in=flight_ids).update(updated_at=timezone.now())
+    transaction.on_commit(partial(bump_version, Flight))
+
+
+@receiver(pre_save, sender=Flight)
+def remember_flight_airplane(sender, instance, **kwargs) -> None:
+    instance._previous_airplane_id = (
+        Flight.objects.filter(pk=instance.pk)
+        .values_list("airplane_id", flat=True)
+        .first()
+        if instance.pk is not None
+        else None
+    )
+
+
+@receiver(post_save, sender=Flight)
+def rebuild_moved_flight_seat_map(sender, instance, created, **kwargs):
+    """Seat map bits depend on the airplane's dimensions"""
+    previous = getattr(instance, "_previous_airplane_id", None)
+    if not created and previous not in (None, instance.airplane_id):
+        rebuild_seat_maps([instance.pk])
+
+
+@receiver(pre_save, sender=Airplane)
+def remember_airplane_dimensions(sender, instance, **kwargs) -> None:
+    instance._previous_dimensions = (
+        Airplane.objects.filter(pk=instance.pk)
+        .values_list("rows", "seats_in_row")
+        .first()
+        if instance.pk is not None
+        else None
+    )
+
+
+@receiver(post_save, sender=Airplane)
+def rebuild_resized_airplane_seat_maps(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_dimensions", None)
+    if not created and previous not in (
+        None,
+        (instance.rows, instance.seats_in_row),
+    ):
+        rebuild_seat_maps(
+            list(instance.flights.values_list("pk", flat=True))
+        )
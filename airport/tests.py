@@ -1,3 +1,1421 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db import transaction
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.models import (
+    AirplaneType,
+    Airplane,
+    Airport,
+    Crew,
+    Location,
+    Route,
+    Flight,
+)
+from airport.cache import (
+    ProcessLocalCache,
+    bump_version,
+    get_versions,
+    version_key,
+)
+from airport.autocomplete import (
+    MAX_SUGGESTIONS,
+    autocomplete_airports,
+    trie_cache,
+)
+from airport.itineraries import Leg, RouteGraph
+from airport.search import search_airports
+from airport.serializers import (
+    AirportListSerializer,
+    AirportListValuesSerializer,
+    FlightListSerializer,
+    FlightListValuesSerializer,
+    RouteListSerializer,
+    RouteListValuesSerializer,
+)
+from airport.views import FlightViewSet
+from airport_service.db.pool import ConnectionPool, PoolTimeout
+from airport_service.db.replica import (
+    PIN_COOKIE,
+    REPLICA,
+    ReplicaMiddleware,
+    ReplicaRouter,
+    read_from_replica,
+)
+from airport_service.renderers import (
+    MessagePackParser,
+    MessagePackRenderer,
+    ORJSONParser,
+    ORJSONRenderer,
+    msgpack,
+)
+from airport_service.throttling import (
+    CacheBucketStore,
+    DatabaseBucketStore,
+    ScopedBucketThrottle,
+    SharedMemoryBucketStore,
+)
+from benchmarks.stats import load_results
+from order.models import Ticket
+from user.models import ThrottleBucket
+
+
+def sample_flight(**params) -> Flight:
+    location = Location.objects.create(city="London", country="UK")
+    source = Airport.objects.create(name="Heathrow", location=location)
+    destination = Airport.objects.create(name="Gatwick", location=location)
+    airplane_type = AirplaneType.objects.create(name="Boeing")
+    defaults = {
+        "route": Route.objects.create(
+            source=source, destination=destination, distance=50
+        ),
+        "airplane": Airplane.objects.create(
+            name="B737", rows=20, seats_in_row=6, airplane_type=airplane_type
+        ),
+        "departure_time": datetime(2023, 12, 23, 10),
+        "arrival_time": datetime(2023, 12, 23, 11),
+    }
+    defaults.update(params)
+    return Flight.objects.create(**defaults)
+
+
+class FlightSearchPlanTests(TestCase):
+    def setUp(self) -> None:
+        self.flight = sample_flight()
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def explain_flight_search(self, **params) -> str:
+        request = Request(APIRequestFactory().get("/", params))
+        view = FlightViewSet(request=request, action="list")
+        return view.get_queryset().explain()
+
+    def test_date_range_uses_departure_index(self) -> None:
+        plan = self.explain_flight_search(
+            depart_from="2023-12-23", depart_to="2023-12-24"
+        )
+
+        self.assertIn("flight_departure_id_idx", plan)
+
+    def test_depart_date_uses_departure_index(self) -> None:
+        plan = self.explain_flight_search(depart_date="2023-12-23")
+
+        self.assertIn("flight_departure_id_idx", plan)
+
+    def test_route_and_date_use_composite_indexes(self) -> None:
+        plan = self.explain_flight_search(
+            source=self.flight.route.source_id,
+            destination=self.flight.route.destination_id,
+            depart_date="2023-12-23",
+        )
+
+        self.assertIn("route_source_destination_idx", plan)
+        self.assertIn("flight_route_departure_idx", plan)
+
+    def test_depart_date_filters_whole_day(self) -> None:
+        sample_flight(departure_time=datetime(2023, 12, 24))
+        request = Request(
+            APIRequestFactory().get("/", {"depart_date": "2023-12-23"})
+        )
+        view = FlightViewSet(request=request, action="list")
+
+        self.assertEqual(list(view.get_queryset()), [self.flight])
+
+
+class AirportSearchTests(TestCase):
+    def setUp(self) -> None:
+        self.heathrow = Airport.objects.create(
+            name="Heathrow",
+            location=Location.objects.create(city="London", country="UK"),
+        )
+        self.boryspil = Airport.objects.create(
+            name="Boryspil",
+            location=Location.objects.create(city="Kyiv", country="Ukraine"),
+        )
+
+    def test_search_tolerates_typos(self) -> None:
+        self.assertEqual(search_airports("heatrow"), [self.heathrow])
+
+    def test_search_matches_city_and_country(self) -> None:
+        self.assertEqual(search_airports("kyiv"), [self.boryspil])
+        self.assertEqual(search_airports("london"), [self.heathrow])
+
+    def test_search_ranks_by_similarity(self) -> None:
+        results = search_airports("ukraine")
+
+        self.assertEqual(results[0], self.boryspil)
+        self.assertEqual(results[0].similarity, 1.0)
+
+    def test_flight_search_uses_every_matching_airport(self) -> None:
+        london = self.heathrow.location
+        airplane = Airplane.objects.create(
+            name="B737",
+            rows=20,
+            seats_in_row=6,
+            airplane_type=AirplaneType.objects.create(name="Boeing"),
+        )
+        departure_time = datetime(2023, 12, 23, 10)
+        for index in range(60):
+            airport = Airport.objects.create(
+                name=f"Terminal {index}", location=london
+            )
+            Flight.objects.create(
+                route=Route.objects.create(
+                    source=airport, destination=self.boryspil, distance=50
+                ),
+                airplane=airplane,
+                departure_time=departure_time,
+                arrival_time=departure_time + timedelta(hours=3),
+            )
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="user@test.com", password="password"
+            )
+        )
+
+        response = client.get(
+            reverse("airport:flight-list"),
+            {"departure": "london", "arrival": "kyiv", "page_size": 100},
+        )
+
+        self.assertEqual(len(response.data["results"]), 60)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        trie_cache.invalidate()
+        self.london = Location.objects.create(city="London", country="UK")
+        self.heathrow = Airport.objects.create(
+            name="London Heathrow", location=self.london
+        )
+        self.boryspil = Airport.objects.create(
+            name="Boryspil",
+            location=Location.objects.create(city="Kyiv", country="Ukraine"),
+        )
+
+    @staticmethod
+    def names(prefix: str, limit: int = 10) -> list[str]:
+        return [
+            suggestion["name"]
+            for suggestion in autocomplete_airports(prefix, limit)
+        ]
+
+    def test_name_prefix_matches(self) -> None:
+        self.assertEqual(self.names("lon"), ["London Heathrow"])
+        self.assertEqual(self.names("london h"), ["London Heathrow"])
+        self.assertEqual(self.names("bory"), ["Boryspil"])
+        self.assertEqual(self.names("heathrow london"), [])
+
+    def test_word_inside_name_matches(self) -> None:
+        self.assertEqual(self.names("hea"), ["London Heathrow"])
+
+    def test_city_and_country_match(self) -> None:
+        self.assertEqual(self.names("kyi"), ["Boryspil"])
+        self.assertEqual(self.names("ukr"), ["Boryspil"])
+        self.assertEqual(
+            autocomplete_airports("uk"),
+            [
+                {
+                    "id": self.boryspil.id,
+                    "name": "Boryspil",
+                    "city": "Kyiv",
+                    "country": "Ukraine",
+                },
+                {
+                    "id": self.heathrow.id,
+                    "name": "London Heathrow",
+                    "city": "London",
+                    "country": "UK",
+                },
+            ],
+        )
+
+    def test_matching_ignores_case_and_punctuation(self) -> None:
+        self.assertEqual(self.names("LONDON-hEa"), ["London Heathrow"])
+        self.assertEqual(self.names("  "), [])
+
+    def test_suggestions_are_capped(self) -> None:
+        Airport.objects.bulk_create(
+            Airport(name=f"Terminal {index:02}", location=self.london)
+            for index in range(MAX_SUGGESTIONS + 5)
+        )
+        bump_version(Airport)
+
+        self.assertEqual(
+            self.names("term", limit=3),
+            ["Terminal 00", "Terminal 01", "Terminal 02"],
+        )
+        self.assertEqual(
+            len(self.names("term", limit=100)), MAX_SUGGESTIONS
+        )
+        self.assertEqual(self.names("term", limit=0), [])
+
+    def test_trie_is_rebuilt_after_airport_and_location_writes(
+        self,
+    ) -> None:
+        self.assertEqual(self.names("gat"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            gatwick = Airport.objects.create(
+                name="Gatwick", location=self.london
+            )
+        self.assertEqual(self.names("gat"), ["Gatwick"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.london.city = "Greater London"
+            self.london.save()
+        self.assertEqual(
+            self.names("greater"), ["Gatwick", "London Heathrow"]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            gatwick.delete()
+        self.assertEqual(self.names("gat"), [])
+
+
+class RouteGraphTests(TestCase):
+    def setUp(self) -> None:
+        departure = datetime(2023, 12, 23, 8)
+        legs = [
+            Leg(1, 1, 3, 2000, departure, departure + timedelta(hours=3)),
+            Leg(2, 1, 2, 100, departure, departure + timedelta(hours=1)),
+            Leg(
+                3,
+                2,
+                3,
+                1900,
+                departure + timedelta(hours=1, minutes=30),
+                departure + timedelta(hours=4),
+            ),
+            Leg(
+                4,
+                2,
+                3,
+                1900,
+                departure + timedelta(hours=3),
+                departure + timedelta(hours=6),
+            ),
+        ]
+        self.graph = RouteGraph(legs, {}, departure)
+        self.day = (datetime(2023, 12, 23), datetime(2023, 12, 24))
+
+    def flight_ids(self, **params) -> list[list[int]]:
+        return sorted(
+            [leg.flight_id for leg in legs]
+            for legs in self.graph.search(1, 3, *self.day, **params)
+        )
+
+    def test_direct_flights_only(self) -> None:
+        self.assertEqual(self.flight_ids(max_legs=1), [[1]])
+
+    def test_connections_respect_min_layover(self) -> None:
+        self.assertEqual(self.flight_ids(max_legs=2), [[1], [2, 4]])
+        self.assertEqual(
+            self.flight_ids(max_legs=2, min_layover=timedelta(minutes=30)),
+            [[1], [2, 3], [2, 4]],
+        )
+
+
+def seed_airport_data(
+    locations: int = 20,
+    routes: int = 60,
+    flights: int = 120,
+    seed: int = 1,
+) -> list[Flight]:
+    """Reference data and upcoming flights, enough to expose N+1 queries"""
+    rnd = random.Random(seed)
+    location_objs = [
+        Location.objects.create(city=f"City {index}", country="Country")
+        for index in range(locations)
+    ]
+    airports = [
+        Airport.objects.create(name=f"Airport {index}", location=location)
+        for index, location in enumerate(location_objs * 2)
+    ]
+    route_objs = [
+        Route.objects.create(
+            source=source,
+            destination=destination,
+            distance=rnd.randint(100, 5000),
+        )
+        for source, destination in (
+            rnd.sample(airports, 2) for _ in range(routes)
+        )
+    ]
+    airplane_types = [
+        AirplaneType.objects.create(name=name)
+        for name in ("Airbus", "Boeing", "Embraer")
+    ]
+    airplanes = [
+        Airplane.objects.create(
+            name=f"Airplane {index}",
+            rows=rnd.randint(20, 40),
+            seats_in_row=6,
+            airplane_type=rnd.choice(airplane_types),
+        )
+        for index in range(10)
+    ]
+    crews = [
+        Crew.objects.create(first_name=f"First {index}", last_name="Last")
+        for index in range(20)
+    ]
+
+    first_departure = datetime.combine(
+        date.today() + timedelta(days=10), datetime.min.time()
+    )
+    flight_objs = []
+    for index in range(flights):
+        departure_time = first_departure + timedelta(hours=index)
+        flight = Flight.objects.create(
+            route=rnd.choice(route_objs),
+            airplane=rnd.choice(airplanes),
+            departure_time=departure_time,
+            arrival_time=departure_time + timedelta(hours=3),
+        )
+        flight.crew.set(rnd.sample(crews, 3))
+        flight_objs.append(flight)
+    return flight_objs
+
+
+class EndpointBudgetMixin:
+    """Checks the SQL query budget of an endpoint and records its latency.
+
+    Set API_TIMINGS_FILE to collect the wall-clock timings as JSON.
+    """
+
+    timings = {}
+
+    def setUp(self) -> None:
+        super().setUp()
+        # cached responses live in the cache
+        cache.clear()
+
+    def request_with_budget(
+        self,
+        max_queries: int,
+        method: str,
+        url: str,
+        *,
+        throttle_writes: int = 1,
+        **kwargs,
+    ):
+        """``throttle_writes`` token bucket upserts of the database
+        throttle store are expected on top of ``max_queries``: one for
+        the user throttle, one more for views with a throttle scope"""
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            elapsed = time.perf_counter() - start
+
+        queries, bucket_writes = [], []
+        for query in context.captured_queries:
+            if ThrottleBucket._meta.db_table in query["sql"]:
+                bucket_writes.append(query["sql"])
+            else:
+                queries.append(query["sql"])
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertLessEqual(len(queries), max_queries, "\n".join(queries))
+        if settings.THROTTLE_STORE == "database":
+            self.assertEqual(len(bucket_writes), throttle_writes)
+        self.timings[f"{method.upper()} {url}"] = elapsed
+        return response
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        path = os.getenv("API_TIMINGS_FILE")
+        if path and cls.timings:
+            timings = {}
+            if os.path.exists(path):
+                with open(path) as timings_file:
+                    timings = json.load(timings_file)
+            timings.update(cls.timings)
+            with open(path, "w") as timings_file:
+                json.dump(timings, timings_file, indent=2, sort_keys=True)
+
+
+class AirportEndpointBudgetTests(EndpointBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.flights = seed_airport_data()
+        cls.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reference_lists(self) -> None:
+        for name in (
+            "airplanetype",
+            "airplane",
+            "location",
+            "airport",
+            "crew",
+            "route",
+        ):
+            with self.subTest(name):
+                self.request_with_budget(
+                    2, "get", reverse(f"airport:{name}-list")
+                )
+
+    def test_reference_list_served_from_cache(self) -> None:
+        url = reverse("airport:route-list")
+        self.client.get(url)
+
+        self.request_with_budget(0, "get", url)
+
+    def test_flight_list(self) -> None:
+        url = reverse("airport:flight-list")
+
+        self.request_with_budget(2, "get", url, throttle_writes=2)
+        self.request_with_budget(
+            2,
+            "get",
+            url,
+            throttle_writes=2,
+            data={"page_size": 100, "depart_from": "2000-01-01"},
+        )
+
+    def test_flight_list_fuzzy_filters(self) -> None:
+        self.request_with_budget(
+            4,
+            "get",
+            reverse("airport:flight-list"),
+            throttle_writes=2,
+            data={"departure": "airport 1", "arrival": "city 2"},
+        )
+
+    def test_flight_detail(self) -> None:
+        self.request_with_budget(
+            4,
+            "get",
+            reverse("airport:flight-detail", args=[self.flights[0].id]),
+        )
+
+    def test_flight_detail_not_modified(self) -> None:
+        url = reverse("airport:flight-detail", args=[self.flights[0].id])
+        etag = self.client.get(url)["ETag"]
+
+        response = self.request_with_budget(
+            1, "get", url, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_flight_seats(self) -> None:
+        self.request_with_budget(
+            1,
+            "get",
+            reverse("airport:flight-seats", args=[self.flights[0].id]),
+        )
+
+    def test_airport_search(self) -> None:
+        self.request_with_budget(
+            1, "get", reverse("airport:airport-search"), data={"q": "city 1"}
+        )
+
+    def test_airport_autocomplete(self) -> None:
+        url = reverse("airport:airport-autocomplete")
+
+        self.request_with_budget(1, "get", url, data={"prefix": "air"})
+        self.request_with_budget(0, "get", url, data={"prefix": "cit"})
+
+    def test_itineraries(self) -> None:
+        route = self.flights[0].route
+        self.request_with_budget(
+            2,
+            "get",
+            reverse("airport:itinerary-list"),
+            throttle_writes=2,
+            data={
+                "from": route.source_id,
+                "to": route.destination_id,
+                "date": self.flights[0].departure_time.date().isoformat(),
+                "max_legs": 3,
+            },
+        )
+
+
+class VersionedCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="user@test.com", password="password"
+            )
+        )
+
+    def get_with_queries(self, name: str) -> tuple[list, int]:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(f"airport:{name}-list"))
+        self.assertEqual(response.status_code, 200)
+        queries = [
+            query
+            for query in context.captured_queries
+            if ThrottleBucket._meta.db_table not in query["sql"]
+        ]
+        return json.loads(response.content), len(queries)
+
+    def test_versions_only_grow(self) -> None:
+        (version,) = get_versions(Location)
+        self.assertEqual(get_versions(Location), (version,))
+
+        cache.set(version_key(Location), version + 10**9, timeout=None)
+        bump_version(Location)
+
+        self.assertEqual(get_versions(Location), (version + 10**9 + 1,))
+
+    def test_writes_bump_version_once_committed(self) -> None:
+        versions = get_versions(Location, Crew)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Location.objects.create(city="Kyiv", country="Ukraine")
+            self.assertEqual(get_versions(Location, Crew), versions)
+
+        for callback in callbacks:
+            callback()
+        location_version, crew_version = get_versions(Location, Crew)
+        self.assertGreater(location_version, versions[0])
+        self.assertEqual(crew_version, versions[1])
+
+    def test_write_invalidates_only_dependent_lists(self) -> None:
+        location = Location.objects.create(city="London", country="UK")
+        Airport.objects.create(name="Heathrow", location=location)
+        for name in ("airport", "route", "crew"):
+            self.get_with_queries(name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Airport.objects.create(name="Gatwick", location=location)
+
+        airports, queries = self.get_with_queries("airport")
+        self.assertEqual(
+            [airport["name"] for airport in airports], ["Heathrow", "Gatwick"]
+        )
+        self.assertGreater(queries, 0)
+        # routes show airport names
+        self.assertGreater(self.get_with_queries("route")[1], 0)
+        self.assertEqual(self.get_with_queries("crew")[1], 0)
+
+    def test_last_modified_is_sent_once_its_second_is_over(self) -> None:
+        url = reverse("airport:location-list")
+        bump_version(Location)
+        self.assertFalse(self.client.get(url).has_header("Last-Modified"))
+
+        (version,) = get_versions(Location)
+        cache.set(version_key(Location), version - 2_000_000, timeout=None)
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        bump_version(Location)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_process_local_cache_rebuilds_on_new_version(self) -> None:
+        builds = []
+        local = ProcessLocalCache(
+            lambda: builds.append(None) or len(builds), (Route,)
+        )
+
+        self.assertEqual((local.get(), local.get()), (1, 1))
+        bump_version(Route)
+        self.assertEqual(local.get(), 2)
+        bump_version(Crew)
+        self.assertEqual(local.get(), 2)
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.flights = seed_airport_data(flights=30)
+        cls.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_same_response(self, name: str, *args, **params) -> None:
+        sync_response = self.client.get(
+            reverse(f"airport:{name}", args=args), params
+        )
+        async_response = self.client.get(
+            reverse(f"airport_async:{name}", args=args), params
+        )
+
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(
+            async_response["Content-Type"], sync_response["Content-Type"]
+        )
+        # pagination links stay on the async endpoints
+        self.assertEqual(
+            async_response.content.replace(b"/api/async/", b"/api/"),
+            sync_response.content,
+        )
+        self.assertEqual(
+            async_response.has_header("ETag"),
+            sync_response.has_header("ETag"),
+        )
+
+    def test_reference_lists(self) -> None:
+        for name in (
+            "airplanetype",
+            "airplane",
+            "location",
+            "airport",
+            "crew",
+            "route",
+        ):
+            with self.subTest(name):
+                # the second response comes from the cache
+                self.assert_same_response(f"{name}-list")
+                self.assert_same_response(f"{name}-list")
+
+    def test_flight_list(self) -> None:
+        route = self.flights[0].route
+        self.assert_same_response("flight-list")
+        self.assert_same_response("flight-list", page_size=7)
+        self.assert_same_response(
+            "flight-list",
+            source=route.source_id,
+            destination=route.destination_id,
+            depart_from="2000-01-01",
+        )
+        self.assert_same_response(
+            "flight-list", departure="airport 1", arrival="city 2"
+        )
+        self.assert_same_response("flight-list", depart_date="tomorrow")
+
+    def test_flight_list_pages(self) -> None:
+        url = reverse("airport_async:flight-list")
+        for _ in range(3):
+            response = self.client.get(url, {"page_size": 10})
+            links = json.loads(response.content)
+            url = links["next"] or links["previous"]
+            cursor = url.split("cursor=")[1]
+            self.assert_same_response(
+                "flight-list", page_size=10, cursor=cursor
+            )
+
+    def test_flight_detail(self) -> None:
+        self.assert_same_response("flight-detail", self.flights[0].id)
+        self.assert_same_response("flight-detail", 0)
+        self.assert_same_response("flight-detail", "abc")
+        response = self.client.get(
+            reverse("airport:flight-detail", args=["abc"])
+        )
+        self.assertEqual(response.status_code, 404)
+
+        url = reverse("airport_async:flight-detail", args=[self.flights[0].id])
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_anonymous_and_throttled_requests(self) -> None:
+        self.client.force_authenticate(None)
+        self.assert_same_response("flight-list")
+
+        self.client.force_authenticate(self.user)
+        url = reverse("airport_async:flight-list")
+        with patch.dict(
+            ScopedBucketThrottle.THROTTLE_RATES, flight_search="1/minute"
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_jwt_user_is_read_once(self) -> None:
+        self.client.force_authenticate(None)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        url = reverse("airport_async:flight-list")
+
+        for user_queries in (1, 0):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                sum(
+                    "user_user" in query["sql"]
+                    for query in context.captured_queries
+                ),
+                user_queries,
+            )
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid")
+        self.assert_same_response("flight-list")
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.flights = seed_airport_data(locations=4, routes=4, flights=12)
+        cls.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_ids(self, url: str, **params) -> tuple[list[int], dict]:
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [flight["id"] for flight in response.data["results"]], (
+            response.data
+        )
+
+    def test_cursors_walk_all_pages_both_ways(self) -> None:
+        expected = [flight.id for flight in reversed(self.flights)]
+        ids, data = self.get_ids(reverse("airport:flight-list"), page_size=5)
+        seen, pages = ids, [(ids, data["previous"])]
+        url = data["next"]
+        while url:
+            ids, data = self.get_ids(url)
+            seen += ids
+            pages.append((ids, data["previous"]))
+            url = data["next"]
+
+        self.assertEqual(seen, expected)
+        ids, _ = self.get_ids(pages[-1][1])
+        self.assertEqual(ids, pages[-2][0])
+
+    def test_stale_cursor_continues_after_deleted_row(self) -> None:
+        ids, data = self.get_ids(reverse("airport:flight-list"), page_size=5)
+        Flight.objects.filter(pk=ids[-1]).delete()
+
+        next_ids, _ = self.get_ids(data["next"])
+
+        self.assertEqual(
+            next_ids, [flight.id for flight in reversed(self.flights)][5:10]
+        )
+
+    def test_tampered_cursors_are_not_found(self) -> None:
+        for position in (["zzz", "q"], [None, None], [1], "x"):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({"p": position}).encode()
+            ).decode()
+            for namespace in ("airport", "airport_async"):
+                with self.subTest(position=position, namespace=namespace):
+                    response = self.client.get(
+                        reverse(f"{namespace}:flight-list"),
+                        {"cursor": cursor},
+                    )
+                    self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(
+            reverse("airport:flight-list"), {"cursor": "not base64"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class BenchCommandTests(TestCase):
+    def test_bench_saves_and_compares_results(self) -> None:
+        seed_airport_data(flights=10)
+        get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            for _ in range(2):
+                call_command(
+                    "bench",
+                    iterations=2,
+                    warmup=0,
+                    baseline=baseline,
+                    stdout=io.StringIO(),
+                )
+            with open(baseline) as baseline_file:
+                results = json.load(baseline_file)
+
+        self.assertIn("order_create_many", results)
+        self.assertEqual(results["flight_list"]["iterations"], 2)
+        self.assertEqual(
+            results["db_connect_pooled"]["database"], connection.vendor
+        )
+        self.assertFalse(Flight.objects.filter(tickets_sold__gt=0).exists())
+
+    def test_bench_with_a_single_iteration(self) -> None:
+        seed_airport_data(flights=10)
+        get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            options = {
+                "warmup": 0,
+                "baseline": os.path.join(directory, "baseline.json"),
+                "stdout": io.StringIO(),
+            }
+            call_command("bench", "flight_list", iterations=1, **options)
+            results = load_results(options["baseline"])
+            with self.assertRaises(CommandError):
+                call_command("bench", "flight_list", iterations=0, **options)
+
+        result = results["flight_list"]
+        self.assertEqual(result["p50"], result["p99"])
+        self.assertEqual(result["iterations"], 1)
+
+
+class SeedBulkCommandTests(TestCase):
+    options = {
+        "locations": 10,
+        "airports": 15,
+        "routes": 30,
+        "airplanes": 5,
+        "crews": 10,
+        "flights": 25,
+        "users": 5,
+        "fill": 0.3,
+        "days": 3,
+        "start_date": date(2030, 1, 1),
+        "batch_size": 10,
+    }
+
+    def seed(self, **options) -> None:
+        call_command(
+            "seed_bulk", **{**self.options, **options}, stdout=io.StringIO()
+        )
+
+    def seeded_flights(self, seed: int) -> list[tuple]:
+        with transaction.atomic():
+            self.seed(seed=seed)
+            flights = [
+                (*flight[:-1], bytes(flight[-1]))
+                for flight in Flight.objects.order_by("pk").values_list(
+                    "route__source__name",
+                    "route__distance",
+                    "airplane__name",
+                    "departure_time",
+                    "arrival_time",
+                    "tickets_sold",
+                    "seat_map",
+                )
+            ]
+            transaction.set_rollback(True)
+        return flights
+
+    def test_same_seed_generates_same_data(self) -> None:
+        flights = self.seeded_flights(seed=3)
+
+        self.assertEqual(self.seeded_flights(seed=3), flights)
+        self.assertNotEqual(self.seeded_flights(seed=4), flights)
+
+    def test_generated_volumes_and_seat_maps_are_consistent(self) -> None:
+        self.seed()
+
+        self.assertEqual(
+            [
+                model.objects.count()
+                for model in (Location, Airport, Route, Airplane, Crew)
+            ],
+            [10, 15, 30, 5, 10],
+        )
+        self.assertEqual(Flight.objects.count(), 25)
+        self.assertFalse(
+            Flight.objects.exclude(
+                departure_time__gte=datetime(2030, 1, 1),
+                departure_time__lt=datetime(2030, 1, 4),
+            ).exists()
+        )
+        self.assertEqual(
+            Flight.objects.aggregate(sold=Sum("tickets_sold"))["sold"],
+            Ticket.objects.count(),
+        )
+        out = io.StringIO()
+        call_command("reconcile_flight_seats", stdout=out)
+        self.assertIn("Reconciled 25 flights, 0 fixed", out.getvalue())
+
+
+class BenchAsgiCommandTests(TransactionTestCase):
+    def test_bench_asgi_compares_sync_and_async(self) -> None:
+        seed_airport_data(flights=10)
+        get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+        stdout = io.StringIO()
+
+        call_command(
+            "bench_asgi",
+            "flight_list",
+            requests=4,
+            warmup=0,
+            concurrency=2,
+            stdout=stdout,
+        )
+
+        self.assertIn("flight_list_sync", stdout.getvalue())
+        self.assertIn("flight_list_async", stdout.getvalue())
+
+
+def assert_same_json(
+    test: TestCase, serializer_class, values_serializer_class, queryset
+) -> None:
+    context = {"request": Request(APIRequestFactory().get("/"))}
+    values_serializer = values_serializer_class(context=context)
+
+    test.assertEqual(
+        JSONRenderer().render(
+            values_serializer.serialize(
+                values_serializer.get_queryset(queryset)
+            )
+        ),
+        JSONRenderer().render(
+            serializer_class(queryset, many=True, context=context).data
+        ),
+    )
+
+
+class ValuesSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        seed_airport_data(flights=30)
+        Airport.objects.filter(pk__lte=5).update(image="uploads/airport.jpg")
+
+    def test_flight_list(self) -> None:
+        Flight.objects.filter(pk__lte=5).update(tickets_sold=7)
+        assert_same_json(
+            self,
+            FlightListSerializer,
+            FlightListValuesSerializer,
+            Flight.objects.order_by("id"),
+        )
+
+    def test_route_list(self) -> None:
+        assert_same_json(
+            self,
+            RouteListSerializer,
+            RouteListValuesSerializer,
+            Route.objects.order_by("id"),
+        )
+
+    def test_airport_list(self) -> None:
+        assert_same_json(
+            self,
+            AirportListSerializer,
+            AirportListValuesSerializer,
+            Airport.objects.order_by("id"),
+        )
+
+
+class RendererTests(TestCase):
+    data = {
+        "departure_time": datetime(2023, 12, 23, 10, 0, 0, 123456),
+        "price": Decimal("1.50"),
+        "message": gettext_lazy("Invalid cursor"),
+        "name": "Kyiv\u2028Boryspil",
+        "tickets": [{"row": 1, "seat": None, "sold": True}],
+        1: "non string key",
+    }
+
+    def test_json_renderer_matches_drf(self) -> None:
+        self.assertEqual(
+            ORJSONRenderer().render(self.data),
+            JSONRenderer().render(self.data),
+        )
+
+    def test_json_renderer_indents_like_drf(self) -> None:
+        media_type = "application/json; indent=2"
+
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_json_parser(self) -> None:
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(b'{"tickets": [{"row": 1}]}')),
+            {"tickets": [{"row": 1}]},
+        )
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"tickets": '))
+
+    @skipUnless(msgpack, "msgpack is not installed")
+    def test_message_pack_round_trip(self) -> None:
+        content = MessagePackRenderer().render(
+            {key: value for key, value in self.data.items() if key != 1}
+        )
+
+        data = MessagePackParser().parse(io.BytesIO(content))
+
+        self.assertEqual(data["departure_time"], "2023-12-23T10:00:00.123456")
+        self.assertEqual(data["price"], 1.5)
+        self.assertEqual(data["tickets"], self.data["tickets"])
+
+
+class ThrottleTests(TestCase):
+    def test_database_store_refills_over_time(self) -> None:
+        store = DatabaseBucketStore()
+
+        with CaptureQueriesContext(connection) as context:
+            results = [store.consume("key", 3, 0.5, 100) for _ in range(4)]
+
+        self.assertEqual(len(context), 4)
+        self.assertEqual(
+            [allowed for allowed, _ in results], [True, True, True, False]
+        )
+        self.assertEqual(store.consume("key", 3, 0.5, 102), (True, 0.0))
+        self.assertEqual(ThrottleBucket.objects.count(), 1)
+
+    def test_cache_store_refills_over_time(self) -> None:
+        cache.clear()
+        store = CacheBucketStore()
+
+        with CaptureQueriesContext(connection) as context:
+            results = [store.consume("key", 3, 0.5, 100) for _ in range(4)]
+
+        self.assertEqual(len(context), 0)
+        self.assertEqual(
+            [allowed for allowed, _ in results], [True, True, True, False]
+        )
+        self.assertEqual(store.consume("key", 3, 0.5, 102), (True, 0.0))
+        self.assertEqual(store.consume("other", 3, 0.5, 102), (True, 2.0))
+
+    def test_idle_buckets_are_pruned(self) -> None:
+        now = time.time()
+        ThrottleBucket.objects.bulk_create(
+            [
+                ThrottleBucket(key="idle", tokens=0, updated_at=now - 86401),
+                ThrottleBucket(key="recent", tokens=0, updated_at=now - 3600),
+            ]
+        )
+        out = io.StringIO()
+
+        call_command("prune_throttle_buckets", stdout=out)
+
+        self.assertIn("Deleted 1 idle throttle buckets", out.getvalue())
+        self.assertEqual(
+            list(ThrottleBucket.objects.values_list("key", flat=True)),
+            ["recent"],
+        )
+
+    def test_shared_memory_store_is_shared_between_instances(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "throttle")
+            first = SharedMemoryBucketStore(path, slots=16)
+            second = SharedMemoryBucketStore(path, slots=16)
+
+            self.assertEqual(first.consume("key", 2, 0.5, 100), (True, 1.0))
+            self.assertEqual(second.consume("key", 2, 0.5, 100), (True, 0.0))
+            self.assertFalse(first.consume("key", 2, 0.5, 101)[0])
+            self.assertEqual(second.consume("key", 2, 0.5, 102), (True, 0.0))
+            self.assertTrue(second.consume("other", 2, 0.5, 102)[0])
+
+    def test_scope_rate_limits_requests(self) -> None:
+        with patch.dict(ScopedBucketThrottle.THROTTLE_RATES, auth="2/minute"):
+            statuses = [
+                self.client.post(
+                    reverse("user:token_obtain_pair"),
+                    {"email": "user@test.com", "password": "password"},
+                ).status_code
+                for _ in range(3)
+            ]
+            response = self.client.post(reverse("user:token_obtain_pair"))
+
+        self.assertEqual(statuses, [401, 401, 429])
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+
+class ConnectionPoolTests(TestCase):
+    def setUp(self) -> None:
+        self.opened = []
+
+    def connect(self):
+        raw_connection = sqlite3.connect(":memory:", check_same_thread=False)
+        self.opened.append(raw_connection)
+        return raw_connection
+
+    def test_connections_are_reused(self) -> None:
+        pool = ConnectionPool(size=2)
+
+        first = pool.getconn(self.connect)
+        pool.putconn(first)
+
+        self.assertIs(pool.getconn(self.connect), first)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_broken_and_expired_connections_are_replaced(self) -> None:
+        pool = ConnectionPool(size=1)
+        broken = pool.getconn(self.connect)
+        pool.putconn(broken)
+        broken.close()
+
+        replacement = pool.getconn(self.connect)
+        self.assertIsNot(replacement, broken)
+
+        pool.max_lifetime = 0
+        pool.putconn(replacement)
+        self.assertEqual(pool.open_count, 0)
+
+    def test_exhausted_pool_waits_for_a_connection(self) -> None:
+        pool = ConnectionPool(size=1, timeout=0.05)
+        raw_connection = pool.getconn(self.connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(self.connect)
+
+        pool.timeout = 5
+        threading.Timer(0.05, pool.putconn, [raw_connection]).start()
+        self.assertIs(pool.getconn(self.connect), raw_connection)
+
+    def test_returned_connection_is_reset_to_autocommit(self) -> None:
+        pool = ConnectionPool(size=1)
+        # psycopg2 connections have an autocommit attribute
+        raw_connection = pool.getconn(lambda: Mock(autocommit=False))
+
+        pool.putconn(raw_connection)
+
+        raw_connection.rollback.assert_called_once()
+        self.assertIs(pool.getconn(self.connect), raw_connection)
+        self.assertIs(raw_connection.autocommit, True)
+
+
+@skipUnless(
+    connection.vendor == "postgresql" and settings.DB_POOL_SIZE,
+    "needs the pooled PostgreSQL backend",
+)
+class PooledBackendTests(TransactionTestCase):
+    def test_connection_returned_in_transaction_is_reusable(self) -> None:
+        connection.ensure_connection()
+        raw_connection = connection.connection
+        raw_connection.autocommit = False
+        with raw_connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.close()
+
+        connection.ensure_connection()
+
+        self.assertIs(connection.connection, raw_connection)
+        self.assertIs(raw_connection.autocommit, True)
+        self.assertEqual(Flight.objects.count(), 0)
+
+
+# the router only checks that the alias is configured
+with_replica = patch(
+    "airport_service.db.replica.has_replica", new=lambda: True
+)
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.factory = RequestFactory()
+        self.read_from = []
+        self.middleware = ReplicaMiddleware(self.get_response)
+
+    def get_response(self, request):
+        # TestCase wraps every test in a transaction on the primary
+        with patch.object(connection, "in_atomic_block", False):
+            self.read_from.append(ReplicaRouter().db_for_read(Flight))
+        return HttpResponse(status=201 if request.method == "POST" else 200)
+
+    @with_replica
+    def test_safe_requests_read_from_replica(self) -> None:
+        self.middleware(self.factory.get("/api/airport/flights/"))
+        self.middleware(self.factory.head("/api/airport/flights/"))
+
+        self.assertEqual(self.read_from, [REPLICA, REPLICA])
+        self.assertIsNone(ReplicaRouter().db_for_read(Flight))
+
+    @with_replica
+    def test_writes_pin_the_client_to_primary(self) -> None:
+        response = self.middleware(
+            self.factory.post(
+                "/api/airport/orders/", HTTP_AUTHORIZATION="Bearer token"
+            )
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        self.factory.cookies[PIN_COOKIE] = "1"
+        self.middleware(self.factory.get("/api/airport/orders/"))
+        self.factory.cookies.clear()
+        self.middleware(
+            self.factory.get(
+                "/api/airport/orders/", HTTP_AUTHORIZATION="Bearer token"
+            )
+        )
+        self.middleware(
+            self.factory.get(
+                "/api/airport/orders/", HTTP_AUTHORIZATION="Bearer other"
+            )
+        )
+
+        self.assertEqual(self.read_from, [None, None, None, REPLICA])
+
+    @with_replica
+    def test_reads_in_a_transaction_stay_on_primary(self) -> None:
+        def get_response(request):
+            with transaction.atomic():
+                self.read_from.append(ReplicaRouter().db_for_read(Flight))
+            return HttpResponse()
+
+        ReplicaMiddleware(get_response)(self.factory.get("/"))
+
+        self.assertEqual(self.read_from, [None])
+
+    @with_replica
+    async def test_async_requests_read_from_replica(self) -> None:
+        async def get_response(request):
+            return self.get_response(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        await middleware(self.factory.get("/api/async/airport/flights/"))
+        response = await middleware(
+            self.factory.post(
+                "/api/airport/orders/", HTTP_AUTHORIZATION="Bearer token"
+            )
+        )
+        await middleware(
+            self.factory.get(
+                "/api/async/airport/flights/",
+                HTTP_AUTHORIZATION="Bearer token",
+            )
+        )
+
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.read_from, [REPLICA, None, None])
+
+    @patch("airport_service.db.replica.has_replica", new=lambda: False)
+    def test_without_replica_everything_uses_primary(self) -> None:
+        response = self.middleware(self.factory.post("/api/airport/orders/"))
+        self.middleware(self.factory.get("/api/airport/flights/"))
+
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.read_from, [None, None])
+
+    def test_replica_is_not_migrated(self) -> None:
+        router = ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate(REPLICA, "airport"))
+        self.assertTrue(router.allow_migrate("default", "airport"))
+        self.assertEqual(router.db_for_write(Flight), "default")
+
+
+class ReplicaLagTests(TransactionTestCase):
+    """The replica is an in-memory database still holding the locations
+    from before the last write to the primary"""
+
+    def setUp(self) -> None:
+        cache.clear()
+        previous = connections.settings.get(REPLICA)
+        if previous is not None:
+            # the configured replica mirrors the test database
+            self.addCleanup(
+                connections.__setitem__, REPLICA, connections[REPLICA]
+            )
+            del connections[REPLICA]
+        connections.settings[REPLICA] = connections.configure_settings(
+            {
+                **settings.DATABASES,
+                REPLICA: {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                },
+            }
+        )[REPLICA]
+        self.addCleanup(self.remove_replica, previous)
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(Location)
+        Location.objects.using(REPLICA).create(city="Lviv", country="UA")
+        Location.objects.create(city="Kyiv", country="UA")
+
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="user@test.com", password="password"
+            )
+        )
+
+    @staticmethod
+    def remove_replica(previous) -> None:
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        if previous is None:
+            del connections.settings[REPLICA]
+        else:
+            connections.settings[REPLICA] = previous
+
+    @staticmethod
+    def age_versions(seconds: int) -> None:
+        (version,) = get_versions(Location)
+        cache.set(
+            version_key(Location), version - seconds * 1_000_000, None
+        )
+
+    def get_cities(self) -> list:
+        response = self.client.get(reverse("airport:location-list"))
+        self.assertEqual(response.status_code, 200)
+        return [location["city"] for location in response.json()]
+
+    @with_replica
+    def test_lists_are_read_from_primary_after_a_change(self) -> None:
+        bump_version(Location)
+
+        self.assertEqual(self.get_cities(), ["Kyiv"])
+        # the cached list holds the primary data
+        self.age_versions(0)
+        self.assertEqual(self.get_cities(), ["Kyiv"])
+
+    @with_replica
+    def test_lists_are_read_from_replica_once_it_caught_up(self) -> None:
+        self.age_versions(settings.REPLICA_PIN_SECONDS + 1)
+
+        self.assertEqual(self.get_cities(), ["Lviv"])
+
+    @with_replica
+    def test_process_local_cache_builds_from_primary_after_a_change(
+        self,
+    ) -> None:
+        local = ProcessLocalCache(
+            lambda: list(Location.objects.values_list("city", flat=True)),
+            (Location,),
+        )
+        token = read_from_replica.set(True)
+        self.addCleanup(read_from_replica.reset, token)
+
+        bump_version(Location)
+        self.assertEqual(local.get(), ["Kyiv"])
+        self.age_versions(settings.REPLICA_PIN_SECONDS + 1)
+        self.assertEqual(local.get(), ["Lviv"])
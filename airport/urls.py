@@ -8,6 +8,7 @@ from airport.views import (
     CrewViewSet,
     RouteViewSet,
     FlightViewSet,
+    ItineraryViewSet,
 )
 
 router = routers.DefaultRouter()
@@ -18,6 +19,7 @@ router.register("airports", AirportViewSet)
 router.register("crews", CrewViewSet)
 router.register("routes", RouteViewSet)
 router.register("flights", FlightViewSet)
+router.register("itineraries", ItineraryViewSet, basename="itinerary")
 
 urlpatterns = router.urls
 
@@ -0,0 +1,175 @@
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# fields whose database value already is the JSON value
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.RelatedField,
+)
+
+
+class ValuesSerializer:
+    """Output of ``serializer_class`` built straight from ``.values()``.
+
+    ``fields`` maps every field of ``serializer_class`` to a lookup, or
+    to such a mapping for a nested serializer, in the same order. The
+    fields of ``serializer_class`` are bound once and only convert values
+    whose database type differs from the JSON one, so there is no
+    serializer or field object created per row.
+
+    Nested ``many=True`` serializers map to None in ``fields`` and to
+    ``(values serializer class, lookup of the parent id)`` in
+    ``many_related``; they cost one query per page.
+    """
+
+    serializer_class = None
+    fields = {}
+    annotations = {}
+    many_related = {}
+
+    def __init__(self, context: dict = None) -> None:
+        self.context = context or {}
+        serializer = self.serializer_class(context=self.context)
+        self.columns = self.compile(serializer, self.fields)
+
+    def compile(self, serializer, fields: dict) -> list[tuple]:
+        readable = [
+            name
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        ]
+        if readable != list(fields):
+            raise ImproperlyConfigured(
+                f"{type(self).__name__}.fields must list "
+                f"{', '.join(readable)} in this order"
+            )
+
+        columns = []
+        for name, lookup in fields.items():
+            field = serializer.fields[name]
+            if isinstance(lookup, dict):
+                columns.append((name, None, None, self.compile(field, lookup)))
+            elif lookup is None:
+                columns.append((name, None, None, None))
+            else:
+                columns.append(
+                    (name, lookup, self.get_converter(field), None)
+                )
+        return columns
+
+    def get_converter(self, field):
+        if isinstance(field, PLAIN_FIELDS):
+            return None
+        if isinstance(field, serializers.FileField):
+            return self.file_converter(field)
+        return field.to_representation
+
+    @staticmethod
+    def file_converter(field):
+        """FileField.to_representation for a file name instead of a file"""
+        storage = field.parent.Meta.model._meta.get_field(
+            field.source
+        ).storage
+        request = field.context.get("request")
+
+        def convert(name: str):
+            if not name:
+                return None
+            url = storage.url(name)
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+
+        return convert
+
+    @property
+    def lookups(self) -> list[str]:
+        def collect(columns):
+            for _, lookup, _, nested in columns:
+                if nested is not None:
+                    yield from collect(nested)
+                elif lookup is not None:
+                    yield lookup
+
+        return list(collect(self.columns))
+
+    def get_queryset(self, queryset: QuerySet, *extra: str) -> QuerySet:
+        return (
+            queryset.prefetch_related(None)
+            .annotate(**self.annotations)
+            .values(*self.lookups, *extra)
+        )
+
+    def to_representation(self, row: dict, columns=None) -> dict:
+        data = {}
+        if columns is None:
+            columns = self.columns
+        for name, lookup, converter, nested in columns:
+            if nested is not None:
+                data[name] = self.to_representation(row, nested)
+                continue
+            if lookup is None:
+                data[name] = []
+                continue
+            value = row[lookup]
+            if converter is not None and value is not None:
+                value = converter(value)
+            data[name] = value
+        return data
+
+    def serialize(self, rows) -> list[dict]:
+        rows = list(rows)
+        data = [self.to_representation(row) for row in rows]
+        if not rows:
+            return data
+
+        for name, (values_serializer_class, parent) in (
+            self.many_related.items()
+        ):
+            values_serializer = values_serializer_class(context=self.context)
+            model = values_serializer.serializer_class.Meta.model
+            related_rows = values_serializer.get_queryset(
+                model.objects.filter(
+                    **{f"{parent}__in": {row["id"] for row in rows}}
+                ),
+                parent,
+            )
+            related = defaultdict(list)
+            for related_row in related_rows:
+                related[related_row[parent]].append(related_row)
+
+            for row, item in zip(rows, data):
+                item[name] = values_serializer.serialize(related[row["id"]])
+        return data
+
+
+class ValuesListMixin:
+    """List through ``values_serializer_class``.
+
+    ``get_serializer_class`` still describes the response, so the schema
+    and every other action are unchanged.
+    """
+
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.values_serializer_class(
+            context=self.get_serializer_context()
+        )
+        queryset = values_serializer.get_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                values_serializer.serialize(page)
+            )
+        return Response(values_serializer.serialize(queryset))
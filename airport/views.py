@@ -1,16 +1,22 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Type
 
-from django.db.models import F, Count, QuerySet
+from django.db.models import QuerySet
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAdminUser
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 from rest_framework.viewsets import GenericViewSet
 
+from airport.autocomplete import MAX_SUGGESTIONS, autocomplete_airports
+from airport.cache import CachedListMixin
+from airport.conditional import ConditionalGetMixin
+from airport.itineraries import MAX_LEGS, search_itineraries
 from airport.models import (
     AirplaneType,
     Airplane,
@@ -20,7 +26,11 @@ from airport.models import (
     Route,
     Flight,
 )
+from airport.pagination import KeysetPagination
 from airport.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport.search import matching_airport_ids, search_airports
+from airport.seat_map import SeatMap
+from airport.values import ValuesListMixin
 
 from airport.serializers import (
     AirplaneTypeSerializer,
@@ -29,32 +39,47 @@ from airport.serializers import (
     LocationSerializer,
     AirportSerializer,
     AirportListSerializer,
+    AirportListValuesSerializer,
     AirportImageSerializer,
+    AirportSearchSerializer,
+    AirportAutocompleteSerializer,
     CrewSerializer,
     RouteSerializer,
     RouteListSerializer,
+    RouteListValuesSerializer,
     FlightSerializer,
     FlightListSerializer,
+    FlightListValuesSerializer,
     FlightDetailSerializer,
+    FlightSeatMapSerializer,
+    ItinerarySerializer,
 )
+from order.models import SeatHold, Ticket
+from order.serializers import SeatHoldSerializer
 
 
 class AirplaneTypeViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
 ):
     queryset = AirplaneType.objects.all()
+    versioned_models = (AirplaneType,)
     serializer_class = AirplaneTypeSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
 
 class AirplaneViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
 ):
-    queryset = Airplane.objects.all()
+    queryset = Airplane.objects.select_related("airplane_type")
+    versioned_models = (Airplane, AirplaneType)
     serializer_class = AirplaneSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
@@ -65,22 +90,30 @@ class AirplaneViewSet(
 
 
 class LocationViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
 ):
     queryset = Location.objects.all()
+    versioned_models = (Location,)
     serializer_class = LocationSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
 
 class AirportViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
+    ValuesListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
 ):
-    queryset = Airport.objects.all()
+    queryset = Airport.objects.select_related("location")
+    versioned_models = (Airport, Location)
     serializer_class = AirportSerializer
+    values_serializer_class = AirportListValuesSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
     def get_serializer_class(self) -> Type[Serializer]:
@@ -90,8 +123,68 @@ class AirportViewSet(
         if self.action == "upload_image":
             return AirportImageSerializer
 
+        if self.action == "search":
+            return AirportSearchSerializer
+
         return AirportSerializer
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                type=OpenApiTypes.STR,
+                required=True,
+                description=(
+                    "Fuzzy search by airport name, city or country "
+                    "(ex. ?q=heatrow)"
+                ),
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="search")
+    def search(self, request) -> Response:
+        """Airports ranked by similarity to the query"""
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": "This query parameter is required."})
+
+        serializer = self.get_serializer(search_airports(query), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="prefix",
+                type=OpenApiTypes.STR,
+                description=(
+                    "Beginning of airport name, city or country "
+                    "(ex. ?prefix=lon)"
+                ),
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=OpenApiTypes.INT,
+                description=(
+                    f"Number of suggestions, {MAX_SUGGESTIONS} at most "
+                    "(ex. ?limit=5)"
+                ),
+            ),
+        ],
+        responses=AirportAutocompleteSerializer(many=True),
+    )
+    @action(methods=["GET"], detail=False, url_path="autocomplete")
+    def autocomplete(self, request) -> Response:
+        """Airport suggestions served from the in-memory prefix trie"""
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+
+        suggestions = autocomplete_airports(
+            request.query_params.get("prefix", ""), max(limit, 0)
+        )
+        return Response(suggestions, status=status.HTTP_200_OK)
+
     @action(
         methods=["POST"],
         detail=True,
@@ -109,22 +202,30 @@ class AirportViewSet(
 
 
 class CrewViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
 ):
     queryset = Crew.objects.all()
+    versioned_models = (Crew,)
     serializer_class = CrewSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
 
 class RouteViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
+    ValuesListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
 ):
-    queryset = Route.objects.all()
+    queryset = Route.objects.select_related("source", "destination")
+    versioned_models = (Route, Airport)
     serializer_class = RouteSerializer
+    values_serializer_class = RouteListValuesSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
     def get_serializer_class(self) -> Type[Serializer]:
@@ -134,47 +235,140 @@ class RouteViewSet(
         return RouteSerializer
 
 
-class FlightViewSet(viewsets.ModelViewSet):
+class FlightPagination(KeysetPagination):
+    ordering = ("-departure_time", "-id")
+    page_size = 20
+    max_page_size = 100
+
+
+class FlightViewSet(
+    ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet
+):
     queryset = (
         Flight.objects.all()
-        .select_related("route", "airplane")
-        .prefetch_related("crew")
-        .annotate(
-            tickets_available=(
-                F("airplane__rows") * F("airplane__seats_in_row")
-                - Count("tickets")
-            )
+        .select_related(
+            "route__source",
+            "route__destination",
+            "airplane__airplane_type",
         )
+        .prefetch_related("crew")
     )
     serializer_class = FlightSerializer
+    values_serializer_class = FlightListValuesSerializer
+    pagination_class = FlightPagination
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    versioned_models = (
+        Flight,
+        Route,
+        Airport,
+        Airplane,
+        AirplaneType,
+        Crew,
+        Ticket,
+        SeatHold,
+    )
+    last_modified_field = "updated_at"
+
+    def get_throttles(self) -> list:
+        if self.action == "list":
+            self.throttle_scope = "flight_search"
+        return super().get_throttles()
+
+    @staticmethod
+    def _params_to_datetime(name: str, value: str) -> datetime:
+        """Parse ISO date (midnight) or datetime query parameter"""
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise ValidationError(
+                {name: "Use ISO format: YYYY-MM-DD or YYYY-MM-DDTHH:MM"}
+            )
+
+    @staticmethod
+    def _params_to_ints(name: str, value: str) -> list[int]:
+        """Converts a list of string IDs to a list of integers"""
+        try:
+            return [int(str_id) for str_id in value.split(",")]
+        except ValueError:
+            raise ValidationError({name: "Use comma separated IDs"})
+
+    @staticmethod
+    def _search_airport_ids(query: str) -> QuerySet | list[int] | None:
+        if not query:
+            return None
+        return matching_airport_ids(query)
 
     def get_queryset(self) -> QuerySet:
-        depart_date = self.request.query_params.get("depart_date")
-        departure = self.request.query_params.get("departure")
-        arrival = self.request.query_params.get("arrival")
+        params = self.request.query_params
+        return self.filter_flights(
+            self.queryset,
+            params,
+            departure_ids=self._search_airport_ids(params.get("departure")),
+            arrival_ids=self._search_airport_ids(params.get("arrival")),
+        )
 
-        queryset = self.queryset
+    @classmethod
+    def filter_flights(
+        cls,
+        queryset: QuerySet,
+        params,
+        departure_ids: QuerySet | list[int] | None = None,
+        arrival_ids: QuerySet | list[int] | None = None,
+    ) -> QuerySet:
+        """Filters compare raw columns with half-open ranges and IDs,
+        so they can be served by the route/departure_time indexes.
+        The airports matching the departure and arrival queries are
+        searched by the caller."""
+        depart_date = params.get("depart_date")
+        depart_from = params.get("depart_from")
+        depart_to = params.get("depart_to")
+        source = params.get("source")
+        destination = params.get("destination")
 
         if depart_date:
-            date = datetime.strptime(
-                depart_date, "%Y-%m-%d"
-            ).date()
+            day_start = cls._params_to_datetime(
+                "depart_date", depart_date
+            ).replace(hour=0, minute=0, second=0, microsecond=0)
+            queryset = queryset.filter(
+                departure_time__gte=day_start,
+                departure_time__lt=day_start + timedelta(days=1),
+            )
+
+        if depart_from:
+            queryset = queryset.filter(
+                departure_time__gte=cls._params_to_datetime(
+                    "depart_from", depart_from
+                )
+            )
+
+        if depart_to:
+            queryset = queryset.filter(
+                departure_time__lt=cls._params_to_datetime(
+                    "depart_to", depart_to
+                )
+            )
+
+        if source:
             queryset = queryset.filter(
-                departure_time__date=date
+                route__source_id__in=cls._params_to_ints("source", source)
             )
 
-        if departure:
+        if destination:
             queryset = queryset.filter(
-                route__source__name__icontains=departure
+                route__destination_id__in=cls._params_to_ints(
+                    "destination", destination
+                )
             )
 
-        if arrival:
+        if departure_ids is not None:
+            queryset = queryset.filter(route__source_id__in=departure_ids)
+
+        if arrival_ids is not None:
             queryset = queryset.filter(
-                route__destination__name__icontains=arrival
+                route__destination_id__in=arrival_ids
             )
 
-        return queryset.distinct()
+        return queryset
 
     def get_serializer_class(self) -> Type[Serializer]:
         if self.action == "list":
@@ -183,8 +377,44 @@ class FlightViewSet(viewsets.ModelViewSet):
         if self.action == "retrieve":
             return FlightDetailSerializer
 
+        if self.action == "seats":
+            return FlightSeatMapSerializer
+
+        if self.action == "holds":
+            return SeatHoldSerializer
+
         return FlightSerializer
 
+    @action(methods=["GET"], detail=True, url_path="seats")
+    def seats(self, request, pk=None) -> Response:
+        """Seat occupancy bitmap of specific flight (base64, LSB first)"""
+        flight = get_object_or_404(
+            Flight.objects.select_related("airplane"), pk=pk
+        )
+        self.check_object_permissions(request, flight)
+        serializer = self.get_serializer(SeatMap.for_flight(flight))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="holds",
+        permission_classes=[IsAuthenticated],
+    )
+    def holds(self, request, pk=None) -> Response:
+        """Reserve seats of specific flight for a few minutes, to be
+        ordered by passing the hold id to the orders endpoint"""
+        flight = get_object_or_404(
+            Flight.objects.select_related("airplane"), pk=pk
+        )
+        serializer = self.get_serializer(
+            data=request.data,
+            context={**self.get_serializer_context(), "flight": flight},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -194,23 +424,151 @@ class FlightViewSet(viewsets.ModelViewSet):
                     "Filter by datetime of flights "
                     "(ex. ?date=2023-12-23)"),
             ),
+            OpenApiParameter(
+                name="depart_from",
+                type=OpenApiTypes.DATETIME,
+                description=(
+                    "Flights departing at or after this moment "
+                    "(ex. ?depart_from=2023-12-23T08:00)"
+                ),
+            ),
+            OpenApiParameter(
+                name="depart_to",
+                type=OpenApiTypes.DATETIME,
+                description=(
+                    "Flights departing strictly before this moment "
+                    "(ex. ?depart_to=2023-12-24)"
+                ),
+            ),
+            OpenApiParameter(
+                name="source",
+                type={"type": "list", "items": {"type": "number"}},
+                description=(
+                    "Filter by source airport ids (ex. ?source=1,2)"
+                ),
+            ),
+            OpenApiParameter(
+                name="destination",
+                type={"type": "list", "items": {"type": "number"}},
+                description=(
+                    "Filter by destination airport ids "
+                    "(ex. ?destination=3)"
+                ),
+            ),
             OpenApiParameter(
                 name="departure",
                 type=OpenApiTypes.STR,
                 description=(
-                    "Filter by name airport of flights "
-                    "(ex. ?departure=heathrow)"
+                    "Fuzzy filter by airport name, city or country "
+                    "of departure (ex. ?departure=heathrow)"
                 ),
             ),
             OpenApiParameter(
                 name="arrival",
                 type=OpenApiTypes.STR,
                 description=(
-                    "Filter by name airport of flights "
-                    "(ex. ?arrival=boryspil)"
+                    "Fuzzy filter by airport name, city or country "
+                    "of arrival (ex. ?arrival=boryspil)"
                 ),
             ),
         ]
     )
     def list(self, request, *args, **kwargs) -> list:
         return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class ItineraryViewSet(GenericViewSet):
+    serializer_class = ItinerarySerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_scope = "flight_search"
+
+    def _param_to_int(self, name: str, default=None) -> int:
+        value = self.request.query_params.get(name, default)
+        if value is None:
+            raise ValidationError({name: "This query parameter is required."})
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: "Must be an integer."})
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="from",
+                type=OpenApiTypes.INT,
+                required=True,
+                description="Source airport id (ex. ?from=1)",
+            ),
+            OpenApiParameter(
+                name="to",
+                type=OpenApiTypes.INT,
+                required=True,
+                description="Destination airport id (ex. ?to=2)",
+            ),
+            OpenApiParameter(
+                name="date",
+                type=OpenApiTypes.DATE,
+                required=True,
+                description="Departure date (ex. ?date=2023-12-23)",
+            ),
+            OpenApiParameter(
+                name="max_legs",
+                type=OpenApiTypes.INT,
+                description=f"Flights per itinerary, 1-{MAX_LEGS} (default 2)",
+            ),
+            OpenApiParameter(
+                name="min_layover",
+                type=OpenApiTypes.INT,
+                description="Minimal connection time in minutes (default 60)",
+            ),
+            OpenApiParameter(
+                name="ordering",
+                type=OpenApiTypes.STR,
+                enum=["duration", "distance"],
+                description="Rank by total duration (default) or distance",
+            ),
+        ]
+    )
+    def list(self, request) -> Response:
+        """Direct and connecting flights between two airports"""
+        source = self._param_to_int("from")
+        destination = self._param_to_int("to")
+        max_legs = self._param_to_int("max_legs", 2)
+        min_layover = self._param_to_int("min_layover", 60)
+        ordering = request.query_params.get("ordering", "duration")
+
+        try:
+            date = datetime.strptime(
+                request.query_params.get("date", ""), "%Y-%m-%d"
+            ).date()
+        except ValueError:
+            raise ValidationError({"date": "Use format YYYY-MM-DD."})
+
+        if source == destination:
+            raise ValidationError({"to": "Must differ from source airport."})
+        if not 1 <= max_legs <= MAX_LEGS:
+            raise ValidationError(
+                {"max_legs": f"Must be between 1 and {MAX_LEGS}."}
+            )
+        if min_layover < 0:
+            raise ValidationError({"min_layover": "Must not be negative."})
+        if ordering not in ("duration", "distance"):
+            raise ValidationError(
+                {"ordering": "Use 'duration' or 'distance'."}
+            )
+
+        itineraries = search_itineraries(
+            source,
+            destination,
+            date,
+            max_legs=max_legs,
+            min_layover=timedelta(minutes=min_layover),
+            order_by=ordering,
+        )
+        serializer = self.get_serializer(itineraries, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
@@ -0,0 +1,219 @@
+"""Read only API views running on the event loop under ASGI.
+
+DRF 3.14 views are synchronous, so ASGI runs each of their requests in a
+thread. AsyncAPIView is a Django async view doing what APIView does for
+GET requests with DRF's own authenticators, permissions, throttles,
+serializers and renderers, so its responses are the same. Authenticators
+with an ``aauthenticate`` method and the shared memory throttle store do
+not leave the event loop; queries go through Django's async ORM.
+"""
+from abc import ABCMeta, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class AsyncAPIView(View, metaclass=ABCMeta):
+    """Subclasses return the response from ``get_response``"""
+
+    http_method_names = ["get", "head", "options"]
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    # the browsable API renders through the methods of DRF views
+    renderer_classes = [
+        renderer
+        for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if renderer.format != "api"
+    ]
+    content_negotiation_class = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS
+    throttle_scope = None
+
+    async def get(self, request, *args, **kwargs) -> HttpResponse:
+        self.request = Request(
+            request,
+            authenticators=self.get_authenticators(),
+            negotiator=self.content_negotiation_class(),
+            parser_context={"view": self, "args": args, "kwargs": kwargs},
+        )
+        try:
+            (
+                self.request.accepted_renderer,
+                self.request.accepted_media_type,
+            ) = self.perform_content_negotiation(self.request)
+            await self.perform_authentication(self.request)
+            self.check_permissions(self.request)
+            await self.check_throttles(self.request)
+            response = await self.get_response(self.request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(self.request, response)
+
+    @abstractmethod
+    async def get_response(self, request, *args, **kwargs) -> HttpResponse:
+        """The response to a GET or HEAD request"""
+
+    def get_authenticators(self) -> list:
+        return [
+            authenticator() for authenticator in self.authentication_classes
+        ]
+
+    def get_permissions(self) -> list:
+        return [permission() for permission in self.permission_classes]
+
+    def get_throttles(self) -> list:
+        return [throttle() for throttle in self.throttle_classes]
+
+    def get_renderers(self) -> list:
+        return [renderer() for renderer in self.renderer_classes]
+
+    def get_renderer_context(self) -> dict:
+        return {
+            "view": self,
+            "args": self.args,
+            "kwargs": self.kwargs,
+            "request": self.request,
+        }
+
+    def get_serializer_context(self) -> dict:
+        return {"request": self.request, "format": None, "view": self}
+
+    def perform_content_negotiation(self, request, force: bool = False):
+        renderers = self.get_renderers()
+        try:
+            return request.negotiator.select_renderer(request, renderers)
+        except Exception:
+            if force:
+                return renderers[0], renderers[0].media_type
+            raise
+
+    async def perform_authentication(self, request) -> None:
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, "aauthenticate"):
+                    user_auth = await authenticator.aauthenticate(request)
+                else:
+                    user_auth = await sync_to_async(
+                        authenticator.authenticate
+                    )(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
+
+    def check_permissions(self, request) -> None:
+        for permission in self.get_permissions():
+            if not permission.has_permission(request, self):
+                if request.authenticators and not (
+                    request.successful_authenticator
+                ):
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(
+                    detail=getattr(permission, "message", None),
+                    code=getattr(permission, "code", None),
+                )
+
+    async def check_throttles(self, request) -> None:
+        if settings.THROTTLE_STORE == "shared_memory":
+            waits = self.get_throttle_waits(request)
+        else:
+            # the other stores query the database
+            waits = await sync_to_async(self.get_throttle_waits)(request)
+        if waits:
+            raise exceptions.Throttled(
+                max((wait for wait in waits if wait is not None), default=None)
+            )
+
+    def get_throttle_waits(self, request) -> list:
+        return [
+            throttle.wait()
+            for throttle in self.get_throttles()
+            if not throttle.allow_request(request, self)
+        ]
+
+    def handle_exception(self, exc: Exception) -> Response:
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            authenticators = self.get_authenticators()
+            if authenticators:
+                exc.auth_header = authenticators[0].authenticate_header(
+                    self.request
+                )
+            else:
+                exc.status_code = 403
+
+        response = api_settings.EXCEPTION_HANDLER(
+            exc, self.get_renderer_context()
+        )
+        if response is None:
+            raise exc
+        response.exception = True
+        return response
+
+    def finalize_response(self, request, response) -> HttpResponse:
+        if isinstance(response, Response):
+            response = self.render_response(request, response)
+        response["Allow"] = ", ".join(self._allowed_methods())
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    def render_response(self, request, response: Response) -> HttpResponse:
+        """Render the response here: Django renders DRF responses in a
+        thread, as they can be template responses"""
+        if not hasattr(request, "accepted_renderer"):
+            (
+                request.accepted_renderer,
+                request.accepted_media_type,
+            ) = self.perform_content_negotiation(request, force=True)
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        response.render()
+
+        return HttpResponse(
+            response.content,
+            status=response.status_code,
+            headers=response.headers,
+        )
+
+
+class AsyncListView(AsyncAPIView):
+    """Unpaginated list of ``queryset``, through ``values_serializer_class``
+    when it is set, as ValuesListMixin does"""
+
+    queryset = None
+    serializer_class = None
+    values_serializer_class = None
+
+    async def get_response(self, request, *args, **kwargs) -> Response:
+        context = self.get_serializer_context()
+        if self.values_serializer_class is None:
+            instances = [
+                instance async for instance in self.queryset.aiterator()
+            ]
+            return Response(
+                self.serializer_class(
+                    instances, many=True, context=context
+                ).data
+            )
+
+        values_serializer = self.values_serializer_class(context=context)
+        queryset = values_serializer.get_queryset(self.queryset)
+        return Response(
+            values_serializer.serialize(
+                [row async for row in queryset.aiterator()]
+            )
+        )
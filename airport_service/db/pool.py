@@ -0,0 +1,210 @@
+"""Connection pooling for Django database backends.
+
+Django 5.0 opens a new database connection for every request, or keeps
+one per thread with CONN_MAX_AGE. A pool lets a process share a bounded
+number of open connections between all its threads instead: WSGI worker
+threads as well as the threads ASGI runs the ORM in, so waiting for a
+connection never blocks the event loop.
+"""
+import collections
+import os
+import threading
+import time
+from typing import Callable
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread safe pool of up to ``size`` DB-API connections.
+
+    ``getconn`` opens new connections with the ``connect`` callable it
+    gets, while there are fewer than ``size``. Connections older than
+    ``max_lifetime`` seconds are closed instead of reused. With ``check``
+    every checkout runs ``SELECT 1`` first and replaces a broken
+    connection. When all connections are in use, ``getconn`` waits
+    ``timeout`` seconds for one to come back, then raises PoolTimeout.
+    """
+
+    def __init__(
+        self,
+        size: int = 10,
+        max_lifetime: float = 30 * 60,
+        timeout: float = 5,
+        check: bool = True,
+    ) -> None:
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check = check
+        self.idle = collections.deque()
+        self.opened_at = {}
+        self.opening = 0
+        self.condition = threading.Condition()
+
+    def getconn(self, connect: Callable):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = None
+            with self.condition:
+                while not self.idle and self.open_count >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"All {self.size} database connections are in "
+                            f"use, waited {self.timeout} seconds"
+                        )
+                    self.condition.wait(remaining)
+                if self.idle:
+                    # the most recently used connection is the warmest one
+                    connection = self.idle.pop()
+                else:
+                    self.opening += 1
+
+            if connection is None:
+                return self.open(connect)
+            if self.is_usable(connection):
+                return connection
+            self.discard(connection)
+
+    def putconn(self, connection) -> None:
+        if not self.reset(connection) or self.is_expired(connection):
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def open(self, connect: Callable):
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.opening -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opening -= 1
+            self.opened_at[id(connection)] = time.monotonic()
+        return connection
+
+    def discard(self, connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.opened_at.pop(id(connection), None)
+            self.condition.notify()
+
+    def close_all(self) -> None:
+        with self.condition:
+            idle, self.idle = list(self.idle), collections.deque()
+        for connection in idle:
+            self.discard(connection)
+
+    @property
+    def open_count(self) -> int:
+        return len(self.opened_at) + self.opening
+
+    def is_expired(self, connection) -> bool:
+        opened_at = self.opened_at.get(id(connection))
+        return (
+            opened_at is None
+            or time.monotonic() - opened_at > self.max_lifetime
+        )
+
+    def is_usable(self, connection) -> bool:
+        if self.is_expired(connection):
+            return False
+        if not self.check:
+            return True
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def reset(connection) -> bool:
+        """End a transaction left open and turn autocommit back on, as
+        Django expects of the connections it gets; False when that fails.
+
+        A psycopg2 connection returned with autocommit off would start a
+        transaction with the next ``SELECT 1`` check, and Django can not
+        switch autocommit on inside one.
+        """
+        try:
+            connection.rollback()
+            if getattr(connection, "autocommit", None) is False:
+                connection.autocommit = True
+        except Exception:
+            return False
+        return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def close_pools() -> None:
+    """Close the idle connections of every pool of the process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+class PooledDatabaseWrapperMixin:
+    """Takes connections from a pool of the process and returns them
+    on close, configured by the ``POOL`` dict of the database settings:
+    SIZE, MAX_LIFETIME, TIMEOUT and CHECK.
+
+    Use it with CONN_MAX_AGE = 0, so every request hands its connection
+    back when it finishes.
+    """
+
+    def get_pool(self) -> ConnectionPool:
+        # forked workers must not share the connections of their parent,
+        # and the test database gets its own pool
+        key = (
+            self.alias,
+            os.getpid(),
+            *(self.settings_dict[name] for name in ("NAME", "HOST", "PORT")),
+        )
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    options = self.settings_dict.get("POOL", {})
+                    pool = ConnectionPool(
+                        size=options.get("SIZE", 10),
+                        max_lifetime=options.get("MAX_LIFETIME", 30 * 60),
+                        timeout=options.get("TIMEOUT", 5),
+                        check=options.get("CHECK", True),
+                    )
+                    _pools[key] = pool
+        return pool
+
+    def open_connection(self, conn_params: dict):
+        return super().get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params: dict):
+        try:
+            return self.get_pool().getconn(
+                lambda: self.open_connection(conn_params)
+            )
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().putconn(self.connection)
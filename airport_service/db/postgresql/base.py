@@ -0,0 +1,14 @@
+from django.db.backends.postgresql import base, creation
+
+from airport_service.db.pool import PooledDatabaseWrapperMixin, close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity) -> None:
+        # PostgreSQL can not drop a database with open connections
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    creation_class = DatabaseCreation
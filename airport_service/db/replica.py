@@ -0,0 +1,160 @@
+"""Reads of safe requests from the ``replica`` database, if there is one.
+
+ReplicaMiddleware marks GET, HEAD and OPTIONS requests, and ReplicaRouter
+sends the reads they make to the replica. Writes always go to the
+primary, and so do all reads of a client for ``REPLICA_PIN_SECONDS``
+after it wrote something, so it reads its own writes despite the
+replication lag. The client is recognised by a cookie, or by its
+Authorization header for API clients that drop cookies. Reads inside a
+transaction on the primary stay there, to see its own changes.
+
+Data cached under the versions of its models, see airport.cache, is read
+from the primary for ``REPLICA_PIN_SECONDS`` after any of them changed:
+the replica may not have the change yet, and what is read would be
+cached as the new version for everybody.
+"""
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+PIN_COOKIE = "pin_primary"
+PIN_CACHE_KEY = "pin-primary:{}"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+def has_replica() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def primary_after_changes(versions):
+    """Read from the primary inside the block while the newest of the
+    ``versions`` (microsecond timestamps) is recent"""
+    changed_since = (time.time() - settings.REPLICA_PIN_SECONDS) * 1_000_000
+    if not read_from_replica.get() or max(versions, default=0) < (
+        changed_since
+    ):
+        yield
+        return
+
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            read_from_replica.get()
+            and has_replica()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+def authorization_pin_key(request):
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    return PIN_CACHE_KEY.format(
+        hashlib.md5(authorization.encode()).hexdigest()
+    )
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            key = self.pin_to_primary(request, response)
+            if key is not None:
+                cache.set(key, 1, settings.REPLICA_PIN_SECONDS)
+            return response
+
+        if not has_replica() or self.is_pinned(request):
+            return self.get_response(request)
+
+        token = read_from_replica.set(True)
+        try:
+            return self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+
+    async def __acall__(self, request):
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            key = self.pin_to_primary(request, response)
+            if key is not None:
+                await cache.aset(key, 1, settings.REPLICA_PIN_SECONDS)
+            return response
+
+        if not has_replica() or await self.ais_pinned(request):
+            return await self.get_response(request)
+
+        token = read_from_replica.set(True)
+        try:
+            return await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+
+    @staticmethod
+    def is_pinned(request) -> bool:
+        if PIN_COOKIE in request.COOKIES:
+            return True
+        key = authorization_pin_key(request)
+        return key is not None and cache.get(key) is not None
+
+    @staticmethod
+    async def ais_pinned(request) -> bool:
+        if PIN_COOKIE in request.COOKIES:
+            return True
+        key = authorization_pin_key(request)
+        return key is not None and await cache.aget(key) is not None
+
+    @staticmethod
+    def pin_to_primary(request, response):
+        """Set the pin cookie after a successful write and return the
+        cache key pinning the Authorization header, if there is one"""
+        if response.status_code >= 400 or not has_replica():
+            return None
+        response.set_cookie(
+            PIN_COOKIE,
+            "1",
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+        return authorization_pin_key(request)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 import os
 
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "drf_spectacular",
     "airport",
@@ -54,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "airport_service.db.replica.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -86,16 +89,73 @@ WSGI_APPLICATION = "airport_service.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# DB_POOL_SIZE connections per process are shared by all its threads,
+# 0 keeps one persistent connection per thread for DB_CONN_MAX_AGE seconds
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "airport_service.db.postgresql"
+            if DB_POOL_SIZE
+            else "django.db.backends.postgresql"
+        ),
         "HOST": os.getenv("POSTGRES_HOST"),
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
+        # pooled connections go back to the pool after every request
+        "CONN_MAX_AGE": (
+            0 if DB_POOL_SIZE else int(os.getenv("DB_CONN_MAX_AGE", "60"))
+        ),
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": {
+            "SIZE": DB_POOL_SIZE,
+            # seconds before a connection is replaced
+            "MAX_LIFETIME": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            # seconds to wait for a free connection before failing
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+            # run SELECT 1 on every checkout
+            "CHECK": os.getenv("DB_POOL_CHECK", "true").lower() == "true",
+        },
     }
 }
 
+# safe requests read from a streaming replica when its host is set
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["airport_service.db.replica.ReplicaRouter"]
+
+# clients read from the primary this many seconds after a write
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Use a shared backend (Redis, Memcached) in production, so cache
+# invalidation reaches every worker process
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# where the throttle token buckets live: "cache" in the cache above,
+# "shared_memory" in a file shared by the worker processes of one host.
+# "database" shares them between hosts exactly, but costs an upsert on
+# the primary per throttle, two or three for every request, reads too
+THROTTLE_STORE = os.getenv("THROTTLE_STORE", "cache")
+THROTTLE_SHARED_MEMORY_PATH = os.getenv("THROTTLE_SHARED_MEMORY_PATH")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -156,15 +216,43 @@ SIMPLE_JWT = {
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "airport_service.throttling.AnonBucketThrottle",
+        "airport_service.throttling.UserBucketThrottle",
+        "airport_service.throttling.ScopedBucketThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        scope: os.getenv(f"THROTTLE_RATE_{scope.upper()}", rate)
+        for scope, rate in (
+            ("anon", "10/day"),
+            ("user", "30/day"),
+            ("flight_search", "60/minute"),
+            ("orders", "10/minute"),
+            ("auth", "5/minute"),
+        )
+    },
+    "DEFAULT_RENDERER_CLASSES": [
+        "airport_service.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "airport_service.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "10/day", "user": "30/day"},
 }
 
+# MessagePack for internal clients, only when msgpack is installed
+if find_spec("msgpack") is not None:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
+        "airport_service.renderers.MessagePackRenderer"
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].append(
+        "airport_service.renderers.MessagePackParser"
+    )
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Airport Service API",
     "DESCRIPTION": "Order airport tickets",
@@ -0,0 +1,243 @@
+"""Token bucket throttles with their state shared between processes.
+
+Every throttle key owns a bucket of ``num_requests`` tokens, refilled at
+``num_requests`` per ``duration`` of its rate: bursts up to the rate pass,
+the long term rate is kept, and a check only updates two numbers.
+``THROTTLE_STORE`` picks where the buckets live: "cache" in the default
+cache, "database" shares them between all hosts at the cost of database
+writes, "shared_memory" between the processes of one host.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from functools import cache
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import connection
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+from user.models import ThrottleBucket
+
+DEFAULT_SHARED_MEMORY_PATH = os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    "airport-service-throttle",
+)
+
+
+def refill(
+    tokens: float, updated_at: float, capacity: int, rate: float, now: float
+) -> tuple[bool, float]:
+    """Whether a request is allowed and the tokens left after it"""
+    tokens = min(capacity, tokens + (now - updated_at) * rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+class CacheBucketStore:
+    """Buckets in the default cache, kept until they are full again.
+
+    Like DRF's own throttles, concurrent requests with the same key may
+    read a bucket before either stores it back, letting one more pass.
+    """
+
+    key_prefix = "throttle-bucket:"
+
+    def consume(
+        self, key: str, capacity: int, rate: float, now: float
+    ) -> tuple[bool, float]:
+        cache_key = self.key_prefix + key
+        tokens, updated_at = django_cache.get(cache_key, (capacity, now))
+        allowed, tokens = refill(tokens, updated_at, capacity, rate, now)
+        django_cache.set(
+            cache_key,
+            (tokens, now),
+            math.ceil((capacity - tokens) / rate) + 1,
+        )
+        return allowed, tokens
+
+
+class DatabaseBucketStore:
+    """Buckets in the ThrottleBucket table, one upsert per check"""
+
+    def consume(
+        self, key: str, capacity: int, rate: float, now: float
+    ) -> tuple[bool, float]:
+        quote = connection.ops.quote_name
+        table = quote(ThrottleBucket._meta.db_table)
+        least = "MIN" if connection.vendor == "sqlite" else "LEAST"
+        refilled = (
+            f"{least}(%s, {table}.{quote('tokens')} + "
+            f"(%s - {table}.{quote('updated_at')}) * %s)"
+        )
+        refilled_params = [capacity, now, rate]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({quote('key')}, {quote('tokens')}, "
+                f"{quote('updated_at')}, {quote('allowed')}) "
+                f"VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT ({quote('key')}) DO UPDATE SET "
+                f"{quote('tokens')} = CASE WHEN {refilled} >= 1 "
+                f"THEN {refilled} - 1 ELSE {refilled} END, "
+                f"{quote('updated_at')} = %s, "
+                f"{quote('allowed')} = {refilled} >= 1 "
+                f"RETURNING {quote('allowed')}, {quote('tokens')}",
+                [
+                    key,
+                    capacity - 1,
+                    now,
+                    capacity >= 1,
+                    *refilled_params * 3,
+                    now,
+                    *refilled_params,
+                ],
+            )
+            allowed, tokens = cursor.fetchone()
+        return bool(allowed), tokens
+
+
+def prune_idle_buckets(batch_size: int = 1000) -> int:
+    """Delete a batch of database buckets idle for the longest throttle
+    duration, returns how many.
+
+    Such buckets have refilled completely, so the next request to their
+    key creates the same full bucket again.
+    """
+    longest = max(
+        SimpleRateThrottle.parse_rate(None, rate)[1]
+        for rate in SimpleRateThrottle.THROTTLE_RATES.values()
+    )
+    keys = list(
+        ThrottleBucket.objects.filter(
+            updated_at__lt=time.time() - longest
+        ).values_list("key", flat=True)[:batch_size]
+    )
+    return ThrottleBucket.objects.filter(key__in=keys).delete()[0]
+
+
+class SharedMemoryBucketStore:
+    """Buckets in a memory mapped file shared by the processes of a host.
+
+    The file is a fixed hash table of (key hash, tokens, updated_at)
+    slots with linear probing. When all probed slots are taken the least
+    recently used one is reused, which at worst refills a bucket early.
+    """
+
+    slot = struct.Struct("<Qdd")
+    probes = 8
+
+    def __init__(self, path: str, slots: int = 65536) -> None:
+        self.slots = slots
+        size = slots * self.slot.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        # file locks are held per process, not per thread
+        self.lock = threading.Lock()
+
+    def consume(
+        self, key: str, capacity: int, rate: float, now: float
+    ) -> tuple[bool, float]:
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+        ) or 1
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                offset = self.find_slot(digest)
+                stored, tokens, updated_at = self.slot.unpack_from(
+                    self.map, offset
+                )
+                if stored != digest:
+                    tokens, updated_at = capacity, now
+                allowed, tokens = refill(
+                    tokens, updated_at, capacity, rate, now
+                )
+                self.slot.pack_into(self.map, offset, digest, tokens, now)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        return allowed, tokens
+
+    def find_slot(self, digest: int) -> int:
+        start = digest % self.slots
+        oldest = None
+        for probe in range(self.probes):
+            offset = (start + probe) % self.slots * self.slot.size
+            stored, _, updated_at = self.slot.unpack_from(self.map, offset)
+            if stored in (digest, 0):
+                return offset
+            if oldest is None or updated_at < oldest[1]:
+                oldest = (offset, updated_at)
+        return oldest[0]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.map[:] = bytes(len(self.map))
+
+
+@cache
+def get_store(name: str):
+    if name == "cache":
+        return CacheBucketStore()
+    if name == "database":
+        return DatabaseBucketStore()
+    if name == "shared_memory":
+        return SharedMemoryBucketStore(
+            settings.THROTTLE_SHARED_MEMORY_PATH or DEFAULT_SHARED_MEMORY_PATH
+        )
+    raise ValueError(f"Unknown THROTTLE_STORE: {name}")
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle keeping a token bucket in THROTTLE_STORE"""
+
+    def allow_request(self, request, view) -> bool:
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        self.refill_rate = self.num_requests / self.duration
+        allowed, self.tokens = get_store(settings.THROTTLE_STORE).consume(
+            key, self.num_requests, self.refill_rate, time.time()
+        )
+        return allowed
+
+    def wait(self) -> float:
+        return max(1 - self.tokens, 0) / self.refill_rate
+
+
+class AnonBucketThrottle(TokenBucketThrottle, AnonRateThrottle):
+    pass
+
+
+class UserBucketThrottle(TokenBucketThrottle, UserRateThrottle):
+    pass
+
+
+class ScopedBucketThrottle(TokenBucketThrottle, ScopedRateThrottle):
+    """Throttles views by their ``throttle_scope``, if they have one"""
+
+    def allow_request(self, request, view) -> bool:
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
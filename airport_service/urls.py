@@ -28,6 +28,10 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/airport/", include("airport.urls", namespace="airport")),
     path("api/airport/", include("order.urls", namespace="order")),
+    path(
+        "api/async/airport/",
+        include("airport.async_urls", namespace="airport_async"),
+    ),
     path("api/user/", include("user.urls", namespace="user")),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
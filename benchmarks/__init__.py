@@ -0,0 +1 @@
+"""Latency benchmarks of the API hot paths, run by ``manage.py bench``"""
@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from airport.models import Flight
+from airport.seat_map import SeatMap
+
+PASSWORD = "benchmark-password"
+
+
+class ApiBenchmarks:
+    """Requests against the hot API paths of the current database.
+
+    Needs a seeded database (see the seed_bulk command). The scenarios
+    write, so they are meant to run inside a transaction that is rolled
+    back afterwards.
+    """
+
+    def __init__(self, tickets: int = 6) -> None:
+        self.tickets = tickets
+        self.user = (
+            get_user_model()
+            .objects.annotate(orders_count=Count("orders"))
+            .order_by("-orders_count", "pk")
+            .first()
+        )
+        if self.user is None:
+            raise ValueError("The database has no users, seed it first")
+        self.user.set_password(PASSWORD)
+        self.user.save(update_fields=["password"])
+
+        self.flight = (
+            Flight.objects.annotate(
+                capacity=F("airplane__rows") * F("airplane__seats_in_row")
+            )
+            .filter(
+                capacity__gte=F("tickets_sold") + F("tickets_held") + tickets
+            )
+            .select_related("route__source", "airplane")
+            .order_by("pk")
+            .first()
+        )
+        if self.flight is None:
+            raise ValueError(
+                f"No flight has {tickets} free seats, seed it first"
+            )
+        seat_map = SeatMap.for_flight(self.flight)
+        self.free_seats = [
+            (row, seat)
+            for row in range(1, seat_map.rows + 1)
+            for seat in range(1, seat_map.seats_in_row + 1)
+            if not seat_map.is_taken(row, seat)
+        ][:tickets]
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous_client = APIClient()
+
+    def get_scenario(self, name: str):
+        return getattr(self, name)
+
+    def get(self, url: str, **params) -> None:
+        self.check(self.client.get(url, params))
+
+    def create_order(self, seats: list[tuple[int, int]]) -> None:
+        self.check(
+            self.client.post(
+                reverse("order:order-list"),
+                {
+                    "tickets": [
+                        {"flight": self.flight.id, "row": row, "seat": seat}
+                        for row, seat in seats
+                    ]
+                },
+                format="json",
+            )
+        )
+
+    @staticmethod
+    def check(response) -> None:
+        if response.status_code >= 400:
+            raise AssertionError(
+                f"{response.status_code}: {response.content[:500]!r}"
+            )
+
+    def flight_list(self) -> None:
+        self.get(reverse("airport:flight-list"))
+
+    def flight_search(self) -> None:
+        self.get(
+            reverse("airport:flight-list"),
+            source=self.flight.route.source_id,
+            destination=self.flight.route.destination_id,
+            depart_date=self.flight.departure_time.date().isoformat(),
+        )
+
+    def flight_fuzzy_search(self) -> None:
+        self.get(
+            reverse("airport:flight-list"),
+            departure=self.flight.route.source.name[:5],
+        )
+
+    def flight_detail(self) -> None:
+        self.get(reverse("airport:flight-detail", args=[self.flight.id]))
+
+    def order_create(self) -> None:
+        self.create_order(self.free_seats[:1])
+
+    def order_create_many(self) -> None:
+        self.create_order(self.free_seats)
+
+    def order_list(self) -> None:
+        self.get(reverse("order:order-list"))
+
+    def token_obtain(self) -> None:
+        self.check(
+            self.anonymous_client.post(
+                reverse("user:token_obtain_pair"),
+                {"email": self.user.email, "password": PASSWORD},
+            )
+        )
+
+
+SCENARIOS = (
+    "flight_list",
+    "flight_search",
+    "flight_fuzzy_search",
+    "flight_detail",
+    "order_create",
+    "order_create_many",
+    "order_list",
+    "token_obtain",
+)
+# scenarios whose writes are rolled back after every request
+WRITE_SCENARIOS = ("order_create", "order_create_many")
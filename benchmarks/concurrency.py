@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.models import Flight
+from benchmarks.stats import percentiles
+
+
+class ConcurrencyBenchmarks:
+    """The sync and async versions of read endpoints under concurrent load.
+
+    Requests go through Django's ASGI application in process, the way an
+    ASGI server calls it, ``concurrency`` at a time. Every request runs in
+    its own thread with its own database connection, as it does behind a
+    server, so the data must be committed.
+    """
+
+    def __init__(self, concurrency: int = 50) -> None:
+        self.concurrency = concurrency
+        user = get_user_model().objects.order_by("pk").first()
+        flight = Flight.objects.order_by("pk").first()
+        if user is None or flight is None:
+            raise ValueError("The database has no flights, seed it first")
+
+        token = AccessToken.for_user(user)
+        self.headers = [
+            (b"host", b"testserver"),
+            (b"authorization", f"Bearer {token}".encode()),
+        ]
+        self.flight_id = flight.pk
+        self.application = ASGIHandler()
+
+    def get_path(self, name: str, mode: str) -> str:
+        namespace = "airport_async" if mode == "async" else "airport"
+        args = [self.flight_id] if name == "flight_detail" else []
+        return reverse(f"{namespace}:{URL_NAMES[name]}", args=args)
+
+    def run(self, name: str, mode: str, requests: int, warmup: int) -> dict:
+        """Latency percentiles in milliseconds and throughput in requests
+        per second of ``requests`` requests to the endpoint"""
+        return asyncio.run(
+            self.load(self.get_path(name, mode), requests, warmup)
+        )
+
+    async def load(self, path: str, requests: int, warmup: int) -> dict:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def timed_request() -> float:
+            async with semaphore:
+                start = time.perf_counter()
+                await self.request(path)
+                return (time.perf_counter() - start) * 1000
+
+        await asyncio.gather(*(timed_request() for _ in range(warmup)))
+        start = time.perf_counter()
+        timings = await asyncio.gather(
+            *(timed_request() for _ in range(requests))
+        )
+        elapsed = time.perf_counter() - start
+
+        result = percentiles(timings)
+        result["throughput"] = round(requests / elapsed, 1)
+        result["iterations"] = requests
+        return result
+
+    async def request(self, path: str) -> None:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": self.headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        body_sent = asyncio.Event()
+        request_read = False
+        status = None
+
+        async def receive() -> dict:
+            nonlocal request_read
+            if not request_read:
+                request_read = True
+                return {"type": "http.request", "body": b""}
+            # the client disconnects once it has the response
+            await body_sent.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif not message.get("more_body"):
+                body_sent.set()
+
+        await self.application(scope, receive, send)
+        if status >= 400:
+            raise AssertionError(f"{status}: GET {path}")
+
+
+URL_NAMES = {
+    "flight_list": "flight-list",
+    "flight_detail": "flight-detail",
+    "route_list": "route-list",
+}
+SCENARIOS = tuple(URL_NAMES)
+MODES = ("sync", "async")
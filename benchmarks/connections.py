@@ -0,0 +1,53 @@
+from functools import partial
+
+from django.db import connection
+
+from airport_service.db.pool import ConnectionPool
+
+
+def select_one(raw_connection) -> None:
+    cursor = raw_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+class ConnectionBenchmarks:
+    """Cost of the database connection of a request: a new connection
+    every time, as without CONN_MAX_AGE, against one taken from a pool"""
+
+    def __init__(self) -> None:
+        # the pooled backend opens its real connections with open_connection
+        connect = getattr(
+            connection, "open_connection", connection.get_new_connection
+        )
+        self.connect = partial(connect, connection.get_connection_params())
+        self.pool = ConnectionPool(
+            size=1,
+            check=connection.settings_dict.get("POOL", {}).get("CHECK", True),
+        )
+
+    def get_scenario(self, name: str):
+        return getattr(self, name)
+
+    def db_connect_new(self) -> None:
+        raw_connection = self.connect()
+        try:
+            select_one(raw_connection)
+        finally:
+            raw_connection.close()
+
+    def db_connect_pooled(self) -> None:
+        raw_connection = self.pool.getconn(self.connect)
+        try:
+            select_one(raw_connection)
+        finally:
+            self.pool.putconn(raw_connection)
+
+    def close(self) -> None:
+        self.pool.close_all()
+
+
+SCENARIOS = ("db_connect_new", "db_connect_pooled")
@@ -0,0 +1,87 @@
+import random
+from datetime import datetime, timedelta
+
+from django.urls import reverse
+
+from airport.models import Airplane, AirplaneType, Flight, Route
+from airport.seat_map import SeatMap
+
+# a 500 seat wide body aircraft, almost sold out
+ROWS = 50
+SEATS_IN_ROW = 10
+FILL = 0.95
+PARTY_SIZES = (2, 4, 9)
+
+
+class SeatingBenchmarks:
+    """Seat assignment for parties on a 95% full 500 seat aircraft.
+
+    The flight is created on the first route of the current database, so
+    the scenarios are meant to run inside a transaction that is rolled
+    back afterwards.
+    """
+
+    def __init__(self, client, seed: int = 0) -> None:
+        self.client = client
+        seat_map = SeatMap(ROWS, SEATS_IN_ROW)
+        sold = random.Random(seed).sample(
+            range(seat_map.capacity), int(seat_map.capacity * FILL)
+        )
+        for position in sold:
+            row, seat = divmod(position, SEATS_IN_ROW)
+            seat_map.take(row + 1, seat + 1)
+        self.seat_map = seat_map
+
+        route = Route.objects.order_by("pk").first()
+        if route is None:
+            raise ValueError("The database has no routes, seed it first")
+        airplane = Airplane.objects.create(
+            name="Benchmark wide body",
+            rows=ROWS,
+            seats_in_row=SEATS_IN_ROW,
+            airplane_type=AirplaneType.objects.create(name="Benchmark"),
+        )
+        departure_time = datetime(2030, 1, 1, 10)
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=departure_time,
+            arrival_time=departure_time + timedelta(hours=10),
+            seat_map=seat_map.to_bytes(),
+            tickets_sold=len(sold),
+        )
+
+    def get_scenario(self, name: str):
+        kind, passengers = name.rsplit("_", 1)
+        method = getattr(self, kind)
+        return lambda: method(int(passengers))
+
+    def seats_find_adjacent(self, passengers: int) -> None:
+        self.seat_map.find_adjacent(passengers)
+
+    def order_auto_assign(self, passengers: int) -> None:
+        response = self.client.post(
+            reverse("order:order-list"),
+            {
+                "auto_assign": {
+                    "flight": self.flight.id,
+                    "passengers": passengers,
+                }
+            },
+            format="json",
+        )
+        if response.status_code >= 400:
+            raise AssertionError(
+                f"{response.status_code}: {response.content[:500]!r}"
+            )
+
+
+SCENARIOS = tuple(
+    f"{kind}_{passengers}"
+    for kind in ("seats_find_adjacent", "order_auto_assign")
+    for passengers in PARTY_SIZES
+)
+# scenarios whose writes are rolled back after every request
+WRITE_SCENARIOS = tuple(
+    name for name in SCENARIOS if name.startswith("order_")
+)
@@ -0,0 +1,84 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from airport.models import Airport, Route, Flight
+from airport.serializers import (
+    AirportListSerializer,
+    AirportListValuesSerializer,
+    FlightListSerializer,
+    FlightListValuesSerializer,
+    RouteListSerializer,
+    RouteListValuesSerializer,
+)
+from order.models import Order
+from order.serializers import OrderListSerializer, OrderListValuesSerializer
+
+
+class SerializerBenchmarks:
+    """Fetch and render ``rows`` rows of a list endpoint, once through the
+    model serializer and once through its values serializer"""
+
+    def __init__(self, rows: int = 100) -> None:
+        self.rows = rows
+        self.context = {"request": Request(APIRequestFactory().get("/"))}
+        self.renderer = JSONRenderer()
+        self.querysets = {
+            "flights": (
+                Flight.objects.select_related(
+                    "route__source", "route__destination", "airplane"
+                ),
+                FlightListSerializer,
+                FlightListValuesSerializer,
+            ),
+            "routes": (
+                Route.objects.select_related("source", "destination"),
+                RouteListSerializer,
+                RouteListValuesSerializer,
+            ),
+            "airports": (
+                Airport.objects.select_related("location"),
+                AirportListSerializer,
+                AirportListValuesSerializer,
+            ),
+            # 20 orders carry about as many tickets as the other lists rows
+            "orders": (
+                Order.objects.prefetch_related(
+                    "tickets__flight__route__source",
+                    "tickets__flight__route__destination",
+                    "tickets__flight__airplane",
+                ),
+                OrderListSerializer,
+                OrderListValuesSerializer,
+            ),
+        }
+
+    def model_serializer(self, name: str) -> None:
+        queryset, serializer_class, _ = self.querysets[name]
+        rows = queryset.order_by("-id")[:self.page_size(name)]
+        self.renderer.render(
+            serializer_class(rows, many=True, context=self.context).data
+        )
+
+    def values_serializer(self, name: str) -> None:
+        queryset, _, values_serializer_class = self.querysets[name]
+        values_serializer = values_serializer_class(context=self.context)
+        rows = values_serializer.get_queryset(queryset).order_by("-id")
+        self.renderer.render(
+            values_serializer.serialize(rows[:self.page_size(name)])
+        )
+
+    def page_size(self, name: str) -> int:
+        return max(self.rows // 5, 1) if name == "orders" else self.rows
+
+    def get_scenario(self, scenario: str):
+        name, serializer = scenario.split("_", 1)
+        method = getattr(self, serializer)
+        return lambda: method(name)
+
+
+SCENARIOS = tuple(
+    f"{name}_{serializer}"
+    for name in ("flights", "routes", "airports", "orders")
+    for serializer in ("model_serializer", "values_serializer")
+)
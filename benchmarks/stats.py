@@ -0,0 +1,56 @@
+import json
+import os
+import statistics
+import time
+from typing import Callable
+
+PERCENTILES = (50, 95, 99)
+
+
+def measure(call: Callable[[], None], iterations: int, warmup: int) -> dict:
+    """Latency percentiles in milliseconds and sequential throughput"""
+    for _ in range(warmup):
+        call()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    result = percentiles(timings)
+    result["throughput"] = round(iterations * 1000 / sum(timings), 1)
+    result["iterations"] = iterations
+    return result
+
+
+def percentiles(timings: list[float]) -> dict:
+    """Percentiles of at least one timing, a single timing is all of them"""
+    if len(timings) < 2:
+        quantiles = timings * 99
+    else:
+        quantiles = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        f"p{percentile}": round(quantiles[percentile - 1], 3)
+        for percentile in PERCENTILES
+    }
+
+
+def load_results(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def save_results(path: str, results: dict) -> None:
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+        results_file.write("\n")
+
+
+def change(current: float, previous: float | None) -> float | None:
+    """Relative change in percent, positive means slower"""
+    if not previous:
+        return None
+    return round((current - previous) * 100 / previous, 1)
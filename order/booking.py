@@ -0,0 +1,324 @@
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+from typing import Callable, TypeVar
+
+from django.db import (
+    IntegrityError,
+    OperationalError,
+    connection,
+    router,
+    transaction,
+)
+from django.db.models import F
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.validators import UniqueTogetherValidator
+
+from airport.cache import bump_version
+from airport.models import Flight
+from airport.seat_map import SeatMap
+from order.models import Order, SeatHold, Ticket
+
+T = TypeVar("T")
+
+SEAT_TAKEN_MESSAGE = UniqueTogetherValidator.message.format(
+    field_names="flight, row, seat"
+)
+HOLD_EXPIRED_MESSAGE = _("The hold has expired.")
+NOT_ENOUGH_SEATS_MESSAGE = _("Not enough free seats on the flight.")
+HOLD_MINUTES = 10
+MAX_HOLD_MINUTES = 30
+MAX_PARTY_SIZE = 9
+BOOKING_ATTEMPTS = 4
+BACKOFF = 0.05
+# serialization_failure, deadlock_detected and lock_not_available
+RETRYABLE_PGCODES = ("40001", "40P01", "55P03")
+UNIQUE_VIOLATION_PGCODE = "23505"
+
+
+class SeatsUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("Some of the requested seats are already taken.")
+    default_code = "seats_unavailable"
+
+    def __init__(self, seats: list[dict] = (), detail=None) -> None:
+        super().__init__(detail)
+        self.detail = {"detail": self.detail, "seats": list(seats)}
+
+
+def is_seat_conflict(error: IntegrityError) -> bool:
+    """Whether a ticket insert lost the race for a seat, violating the
+    unique (flight, row, seat) constraint of tickets"""
+    table = Ticket._meta.db_table
+    cause = error.__cause__
+    if getattr(cause, "pgcode", None) is not None:
+        constraint = getattr(cause.diag, "constraint_name", None) or ""
+        return cause.pgcode == UNIQUE_VIOLATION_PGCODE and (
+            constraint.startswith(f"{table}_flight_id_row_seat_")
+        )
+    # SQLite names the columns of the constraint instead
+    return str(error) == (
+        f"UNIQUE constraint failed: "
+        f"{table}.flight_id, {table}.row, {table}.seat"
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, IntegrityError):
+        return is_seat_conflict(error)
+    pgcode = getattr(error.__cause__, "pgcode", None)
+    return pgcode in RETRYABLE_PGCODES or "locked" in str(error)
+
+
+def run_with_retry(
+    func: Callable[[], T], attempts: int = BOOKING_ATTEMPTS
+) -> T:
+    """Run func in a transaction, retrying lost races with backoff.
+
+    Deadlocks, serialization failures and seat conflicts roll the whole
+    transaction back, so they can only be retried when this is the
+    outermost transaction. Seat conflicts left after the last attempt
+    raise SeatsUnavailable, other integrity errors propagate.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func()
+        except (IntegrityError, OperationalError) as error:
+            if (
+                attempt == attempts
+                or connection.in_atomic_block
+                or not is_retryable(error)
+            ):
+                if isinstance(error, IntegrityError) and (
+                    is_seat_conflict(error)
+                ):
+                    raise SeatsUnavailable() from error
+                raise
+            time.sleep(BACKOFF * 2 ** (attempt - 1) * random.uniform(1, 2))
+
+
+def lock_flights(flight_ids) -> dict[int, Flight]:
+    """Lock flights in primary key order to avoid deadlocks"""
+    flights = (
+        Flight.objects.select_for_update(of=("self",))
+        .select_related("airplane")
+        .filter(pk__in=set(flight_ids))
+        .order_by("pk")
+    )
+    return {flight.pk: flight for flight in flights}
+
+
+def release_expired_holds(seat_maps: dict[int, SeatMap]) -> dict[int, int]:
+    """Free the seats of expired holds on flights locked by the caller.
+
+    Returns the number of released seats per flight.
+    """
+    holds = list(
+        SeatHold.objects.filter(
+            flight_id__in=seat_maps, expires_at__lte=timezone.now()
+        ).only("id", "flight_id", "seats")
+    )
+    released = defaultdict(int)
+    for hold in holds:
+        for seat in hold.seats:
+            seat_maps[hold.flight_id].release(seat["row"], seat["seat"])
+        released[hold.flight_id] += len(hold.seats)
+
+    if holds:
+        delete_released_holds(holds)
+    return released
+
+
+def delete_released_holds(holds: list[SeatHold]) -> None:
+    """Delete holds whose seats the caller has released in the locked
+    seat maps, so the post_delete signal does not release them again"""
+    for hold in holds:
+        hold._seats_released = True
+    collector = Collector(using=router.db_for_write(SeatHold))
+    collector.collect(holds)
+    collector.delete()
+    transaction.on_commit(partial(bump_version, SeatHold))
+
+
+def save_seat_maps(
+    seat_maps: dict[int, SeatMap], sold: dict = None, held: dict = None
+) -> None:
+    """Store seat maps of locked flights with their counter changes"""
+    sold = sold or {}
+    held = held or {}
+    for flight_id, seat_map in seat_maps.items():
+        Flight.objects.filter(pk=flight_id).update(
+            seat_map=seat_map.to_bytes(),
+            tickets_sold=F("tickets_sold") + sold.get(flight_id, 0),
+            tickets_held=F("tickets_held") + held.get(flight_id, 0),
+            updated_at=timezone.now(),
+        )
+
+
+def hold_seats(
+    flight: Flight, user, seats: list[dict], minutes: int = HOLD_MINUTES
+) -> SeatHold:
+    """Reserve free seats of a flight for the user for a few minutes"""
+    with transaction.atomic():
+        flight = lock_flights([flight.pk])[flight.pk]
+        seat_maps = {flight.pk: SeatMap.for_flight(flight)}
+        released = release_expired_holds(seat_maps)
+
+        unavailable = [
+            {"flight": flight.pk, **seat}
+            for seat in seats
+            if seat_maps[flight.pk].is_taken(seat["row"], seat["seat"])
+        ]
+        if unavailable:
+            raise SeatsUnavailable(unavailable)
+
+        for seat in seats:
+            seat_maps[flight.pk].take(seat["row"], seat["seat"])
+        save_seat_maps(
+            seat_maps, held={flight.pk: len(seats) - released[flight.pk]}
+        )
+        transaction.on_commit(partial(bump_version, SeatHold))
+        return SeatHold.objects.create(
+            flight=flight,
+            user=user,
+            seats=[
+                {"row": seat["row"], "seat": seat["seat"]} for seat in seats
+            ],
+            expires_at=timezone.now() + timedelta(minutes=minutes),
+        )
+
+
+def expire_holds(batch_size: int = 500) -> tuple[int, int]:
+    """Release the seats of expired holds on a batch of flights.
+
+    Returns the numbers of flights and seats released.
+    """
+    flight_ids = set(
+        SeatHold.objects.filter(expires_at__lte=timezone.now())
+        .order_by("expires_at")
+        .values_list("flight_id", flat=True)[:batch_size]
+    )
+    if not flight_ids:
+        return 0, 0
+
+    with transaction.atomic():
+        seat_maps = {
+            flight_id: SeatMap.for_flight(flight)
+            for flight_id, flight in lock_flights(flight_ids).items()
+        }
+        released = release_expired_holds(seat_maps)
+        save_seat_maps(
+            {flight_id: seat_maps[flight_id] for flight_id in released},
+            held={
+                flight_id: -seats for flight_id, seats in released.items()
+            },
+        )
+    return len(released), sum(released.values())
+
+
+def book_tickets(
+    order: Order,
+    tickets_data: list[dict],
+    hold: SeatHold = None,
+    auto_assign: dict = None,
+) -> list[Ticket]:
+    """Validate and insert all tickets of an order in one batch.
+
+    Must run inside a transaction, seat ranges are expected to be validated
+    by TicketSerializer already. Every requested seat is checked against
+    the locked seat map of its flight, so all conflicts are reported at
+    once: seats repeated within the order fail validation, seats sold to
+    someone else raise SeatsUnavailable. The seats of ``hold`` are
+    already taken in the seat map and become the tickets.
+
+    ``auto_assign`` is a ``{"flight", "passengers"}`` dict; the seats of
+    those passengers are picked from the locked seat map, next to each
+    other where possible.
+    """
+    flight_ids = [ticket_data["flight"].pk for ticket_data in tickets_data]
+    if auto_assign is not None:
+        flight_ids.append(auto_assign["flight"].pk)
+    flights = lock_flights(flight_ids)
+    seat_maps = {
+        flight_id: SeatMap.for_flight(flight)
+        for flight_id, flight in flights.items()
+    }
+    held = {
+        flight_id: -seats
+        for flight_id, seats in release_expired_holds(seat_maps).items()
+    }
+
+    if auto_assign is not None:
+        flight = flights[auto_assign["flight"].pk]
+        seats = seat_maps[flight.pk].find_adjacent(auto_assign["passengers"])
+        if seats is None:
+            raise SeatsUnavailable(detail=NOT_ENOUGH_SEATS_MESSAGE)
+        tickets_data = tickets_data + [
+            {"flight": flight, "row": row, "seat": seat}
+            for row, seat in seats
+        ]
+
+    held_seats = set()
+    if hold is not None:
+        if not SeatHold.objects.filter(pk=hold.pk).exists():
+            raise ValidationError({"hold": [HOLD_EXPIRED_MESSAGE]})
+        held_seats = {(seat["row"], seat["seat"]) for seat in hold.seats}
+        held[hold.flight_id] = held.get(hold.flight_id, 0) - len(held_seats)
+
+    errors = []
+    unavailable = []
+    requested = defaultdict(set)
+    for ticket_data in tickets_data:
+        flight_id = ticket_data["flight"].pk
+        seat = (ticket_data["row"], ticket_data["seat"])
+        if seat in requested[flight_id]:
+            errors.append({"non_field_errors": [SEAT_TAKEN_MESSAGE]})
+        else:
+            errors.append({})
+            if seat_maps[flight_id].is_taken(*seat) and not (
+                flight_id == getattr(hold, "flight_id", None)
+                and seat in held_seats
+            ):
+                unavailable.append(
+                    {"flight": flight_id, "row": seat[0], "seat": seat[1]}
+                )
+        requested[flight_id].add(seat)
+
+    if any(errors):
+        raise ValidationError({"tickets": errors})
+    if unavailable:
+        raise SeatsUnavailable(unavailable)
+
+    tickets = Ticket.objects.bulk_create(
+        [
+            Ticket(
+                order=order,
+                flight=flights[ticket_data["flight"].pk],
+                row=ticket_data["row"],
+                seat=ticket_data["seat"],
+            )
+            for ticket_data in tickets_data
+        ]
+    )
+
+    for flight_id, seats in requested.items():
+        for seat in seats:
+            seat_maps[flight_id].take(*seat)
+    save_seat_maps(
+        seat_maps,
+        sold={flight_id: len(seats) for flight_id, seats in requested.items()},
+        held=held,
+    )
+    if hold is not None:
+        delete_released_holds([hold])
+
+    # bulk_create sends no post_save signals
+    transaction.on_commit(partial(bump_version, Ticket))
+    return tickets
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from order.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_TTL = timedelta(hours=24)
+MAX_KEY_LENGTH = 255
+# how long a duplicate waits for the request holding its key, in seconds
+IN_FLIGHT_WAIT = 10
+# the request holding a key touches it this often, in seconds
+HEARTBEAT_INTERVAL = 2
+# in flight keys not touched for this long were left by crashed requests
+IN_FLIGHT_LEASE = timedelta(seconds=HEARTBEAT_INTERVAL * 5)
+POLL_INTERVAL = 0.05
+
+
+class IdempotencyKeyInFlight(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _(
+        "A request with this Idempotency-Key is still in progress."
+    )
+    default_code = "idempotency_key_in_flight"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _(
+        "This Idempotency-Key was already used for a different request."
+    )
+    default_code = "idempotency_key_reused"
+
+
+class IdempotencyKeyLost(Exception):
+    """The key was reclaimed while its request was running"""
+
+
+def request_fingerprint(request) -> str:
+    body = json.dumps(request.data, cls=JSONEncoder, sort_keys=True)
+    return hashlib.sha256(f"{request.path}|{body}".encode()).hexdigest()
+
+
+def stale_keys(now) -> Q:
+    """Expired records and the in flight ones without a heartbeat"""
+    return Q(expires_at__lte=now) | Q(
+        status_code__isnull=True, heartbeat_at__lte=now - IN_FLIGHT_LEASE
+    )
+
+
+def claim_key(user, key: str, fingerprint: str) -> tuple[IdempotencyKey, bool]:
+    """The record of the key and whether this request created it"""
+    now = timezone.now()
+    IdempotencyKey.objects.filter(stale_keys(now), user=user, key=key).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user,
+                key=key,
+                fingerprint=fingerprint,
+                heartbeat_at=now,
+                expires_at=now + IDEMPOTENCY_TTL,
+            )
+        return record, True
+    except IntegrityError:
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        return record, False
+
+
+def delete_stale_keys(batch_size: int = 500) -> int:
+    """Delete a batch of expired and abandoned keys, returns how many"""
+    ids = list(
+        IdempotencyKey.objects.filter(stale_keys(timezone.now())).values_list(
+            "pk", flat=True
+        )[:batch_size]
+    )
+    return IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+
+
+def touch_key(pk: int, stop: threading.Event) -> None:
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                IdempotencyKey.objects.filter(
+                    pk=pk, status_code__isnull=True
+                ).update(heartbeat_at=timezone.now())
+            except DatabaseError:
+                # the next beat tries again
+                pass
+    finally:
+        connection.close()
+
+
+@contextmanager
+def heartbeat(record: IdempotencyKey):
+    """Keep the in flight record alive while the block runs, however long
+    it takes, from a thread with its own database connection"""
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=touch_key, args=(record.pk, stop), daemon=True
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def wait_for_response(record: IdempotencyKey, deadline: float):
+    """The record once its response is stored, None when it was released"""
+    while record is not None and record.status_code is None:
+        if time.monotonic() > deadline:
+            raise IdempotencyKeyInFlight()
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+class IdempotentCreateMixin:
+    """Replay the first response to a create sent with an Idempotency-Key.
+
+    The first request claims the key of its user, runs the create and
+    stores the status and body for ``IDEMPOTENCY_TTL``. Retries get that
+    response back without validating or writing anything, duplicates
+    arriving while the first request runs wait for its response. Server
+    errors release the key, so the client can retry them. The running
+    request keeps a heartbeat on its key; only a key whose heartbeat
+    stopped, as its process died, is claimed again.
+    """
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError(
+                {
+                    IDEMPOTENCY_HEADER: [
+                        f"Ensure this header has no more than "
+                        f"{MAX_KEY_LENGTH} characters."
+                    ]
+                }
+            )
+
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + IN_FLIGHT_WAIT
+        while True:
+            record, claimed = claim_key(request.user, key, fingerprint)
+            if claimed:
+                break
+            if record is None:
+                continue
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            record = wait_for_response(record, deadline)
+            if record is not None:
+                return Response(
+                    record.response,
+                    status=record.status_code,
+                    headers={REPLAYED_HEADER: "true"},
+                )
+
+        try:
+            with heartbeat(record):
+                try:
+                    response = super().create(request, *args, **kwargs)
+                except Exception as exc:
+                    # re-raises everything that is not an API error
+                    response = self.handle_exception(exc)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+            return response
+
+        stored = IdempotencyKey.objects.filter(
+            pk=record.pk, status_code__isnull=True
+        ).update(status_code=response.status_code, response=response.data)
+        if not stored:
+            raise IdempotencyKeyLost(
+                f"Idempotency key {record.key!r} of user {record.user_id} "
+                "was reclaimed before its response was stored"
+            )
+        return response
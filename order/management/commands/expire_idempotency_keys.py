@@ -0,0 +1,35 @@
+import time
+
+from django.core.management import BaseCommand
+
+from order.idempotency import delete_stale_keys
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Delete expired idempotency keys and the ones left in flight by "
+        "crashed requests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep sweeping every INTERVAL seconds instead of once",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            keys = 0
+            while True:
+                batch_keys = delete_stale_keys(options["batch_size"])
+                if not batch_keys:
+                    break
+                keys += batch_keys
+
+            self.stdout.write(f"Deleted {keys} idempotency keys")
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
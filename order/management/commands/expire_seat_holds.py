@@ -0,0 +1,37 @@
+import time
+
+from django.core.management import BaseCommand
+
+from order.booking import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Release the seats of expired seat holds"  # noqa: VNE003
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep sweeping every INTERVAL seconds instead of once",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flights = seats = 0
+            while True:
+                batch_flights, batch_seats = expire_holds(
+                    options["batch_size"]
+                )
+                if not batch_flights:
+                    break
+                flights += batch_flights
+                seats += batch_seats
+
+            self.stdout.write(
+                f"Released {seats} held seats on {flights} flights"
+            )
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
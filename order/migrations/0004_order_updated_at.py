@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0003_alter_ticket_options_alter_ticket_unique_together"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-18 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0007_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="idempotencykey",
+            name="expires_at",
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 21:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0008_alter_idempotencykey_expires_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="heartbeat_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
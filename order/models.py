@@ -1,18 +1,27 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 
 from airport.models import Flight
 
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="orders"
     )
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="order_user_created_id_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return str(self.created_at)
@@ -71,3 +80,59 @@ class Ticket(models.Model):
     class Meta:
         unique_together = ("flight", "row", "seat")
         ordering = ["row", "seat"]
+
+
+class SeatHold(models.Model):
+    """Seats reserved for a user until ``expires_at``.
+
+    Held seats are marked taken in the flight's seat map and counted in
+    its tickets_held, so reads never need to look at holds.
+    """
+
+    flight = models.ForeignKey(
+        to=Flight, on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    seats = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["flight", "expires_at"],
+                name="seathold_flight_expires_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.flight_id}: {self.seats} until {self.expires_at}"
+
+
+class IdempotencyKey(models.Model):
+    """First response to an order request sent with an Idempotency-Key.
+
+    ``status_code`` stays empty while the first request is in flight,
+    which moves ``heartbeat_at`` forward until it is done.
+    """
+
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("user", "key")
+
+    def __str__(self) -> str:
+        return f"{self.user_id}: {self.key}"
@@ -1,12 +1,47 @@
-from django.db import transaction
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from airport.serializers import FlightListSerializer
-from order.models import Order, Ticket
+from airport.models import Flight
+from airport.serializers import FlightListSerializer, tickets_available
+from airport.values import ValuesSerializer
+from order.booking import (
+    MAX_HOLD_MINUTES,
+    MAX_PARTY_SIZE,
+    HOLD_MINUTES,
+    book_tickets,
+    hold_seats,
+    run_with_retry,
+)
+from order.models import Order, SeatHold, Ticket
+
+
+class FlightPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Look up every flight only once per serializer tree"""
+
+    def to_internal_value(self, data) -> Flight:
+        flights = self.context.setdefault("flights", {})
+        if str(data) not in flights:
+            flights[str(data)] = super().to_internal_value(data)
+        return flights[str(data)]
+
+
+@extend_schema_field(OpenApiTypes.INT)
+class SeatHoldPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Only holds of the requesting user can be found"""
+
+    def get_queryset(self):
+        return SeatHold.objects.select_related("flight__airplane").filter(
+            user=self.context["request"].user
+        )
 
 
 class TicketSerializer(serializers.ModelSerializer):
+    flight = FlightPrimaryKeyRelatedField(
+        queryset=Flight.objects.select_related("airplane")
+    )
+
     def validate(self, attrs) -> dict:
         data = super(TicketSerializer, self).validate(attrs=attrs)
         Ticket.validate_ticket(
@@ -20,27 +55,146 @@ class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "flight")
+        # seat uniqueness is checked for the whole order in book_tickets
+        validators = []
 
 
 class TicketListSerializer(TicketSerializer):
     flight = FlightListSerializer(many=False, read_only=True)
 
 
+class AutoAssignSerializer(serializers.Serializer):
+    flight = FlightPrimaryKeyRelatedField(
+        queryset=Flight.objects.select_related("airplane")
+    )
+    passengers = serializers.IntegerField(
+        min_value=1, max_value=MAX_PARTY_SIZE
+    )
+
+
 class OrderSerializer(serializers.ModelSerializer):
-    tickets = TicketSerializer(many=True, read_only=False, allow_empty=False)
+    tickets = TicketSerializer(
+        many=True, read_only=False, allow_empty=False, required=False
+    )
+    hold = SeatHoldPrimaryKeyRelatedField(
+        write_only=True,
+        required=False,
+        help_text="Seat hold to turn into the tickets of the order",
+    )
+    auto_assign = AutoAssignSerializer(
+        write_only=True,
+        required=False,
+        help_text="Book adjacent seats for this many passengers",
+    )
 
     class Meta:
         model = Order
-        fields = ("id", "tickets", "created_at")
+        fields = ("id", "tickets", "created_at", "hold", "auto_assign")
+
+    def validate(self, attrs) -> dict:
+        data = super(OrderSerializer, self).validate(attrs=attrs)
+        modes = [
+            name for name in ("tickets", "hold", "auto_assign") if name in data
+        ]
+        if not modes:
+            error = self.fields["tickets"].error_messages["required"]
+            raise ValidationError({"tickets": [error]})
+        if len(modes) > 1:
+            raise ValidationError(
+                {
+                    modes[-1]: [
+                        "Order either tickets, a hold or auto assigned "
+                        "seats, only one of them."
+                    ]
+                }
+            )
+
+        hold = data.get("hold")
+        if hold is not None:
+            data["tickets"] = [
+                {"flight": hold.flight, **seat} for seat in hold.seats
+            ]
+        return data
 
     def create(self, validated_data) -> Order:
-        with transaction.atomic():
-            tickets_data = validated_data.pop("tickets")
+        tickets_data = validated_data.pop("tickets", [])
+        hold = validated_data.pop("hold", None)
+        auto_assign = validated_data.pop("auto_assign", None)
+
+        def create_order() -> Order:
             order = Order.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
+            book_tickets(order, tickets_data, hold, auto_assign)
             return order
 
+        return run_with_retry(create_order)
+
 
 class OrderListSerializer(OrderSerializer):
     tickets = TicketListSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ("id", "tickets", "created_at")
+
+
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    seat = serializers.IntegerField()
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    seats = SeatSerializer(many=True, allow_empty=False)
+    minutes = serializers.IntegerField(
+        write_only=True,
+        min_value=1,
+        max_value=MAX_HOLD_MINUTES,
+        default=HOLD_MINUTES,
+        help_text="How long the seats stay reserved",
+    )
+
+    class Meta:
+        model = SeatHold
+        fields = ("id", "flight", "seats", "minutes", "expires_at")
+        read_only_fields = ("flight", "expires_at")
+
+    def validate_seats(self, seats: list[dict]) -> list[dict]:
+        airplane = self.context["flight"].airplane
+        for seat in seats:
+            Ticket.validate_ticket(
+                seat["row"], seat["seat"], airplane, ValidationError
+            )
+        if len({(seat["row"], seat["seat"]) for seat in seats}) < len(seats):
+            raise ValidationError("Every seat can be held only once.")
+        return seats
+
+    def create(self, validated_data) -> SeatHold:
+        return hold_seats(
+            self.context["flight"],
+            self.context["request"].user,
+            validated_data["seats"],
+            validated_data["minutes"],
+        )
+
+
+class TicketListValuesSerializer(ValuesSerializer):
+    serializer_class = TicketListSerializer
+    fields = {
+        "id": "id",
+        "row": "row",
+        "seat": "seat",
+        "flight": {
+            "id": "flight__id",
+            "route_source": "flight__route__source__name",
+            "route_destination": "flight__route__destination__name",
+            "departure_time": "flight__departure_time",
+            "arrival_time": "flight__arrival_time",
+            "tickets_available": "flight_tickets_available",
+        },
+    }
+    annotations = {"flight_tickets_available": tickets_available("flight__")}
+
+
+class OrderListValuesSerializer(ValuesSerializer):
+    serializer_class = OrderListSerializer
+    fields = {"id": "id", "tickets": None, "created_at": "created_at"}
+    many_related = {"tickets": (TicketListValuesSerializer, "order_id")}
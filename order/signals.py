@@ -0,0 +1,75 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from airport.cache import bump_version
+from airport.seat_map import update_flight_seat_map
+from order.models import Order, SeatHold, Ticket
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_ticket_seat(sender, instance, **kwargs) -> None:
+    instance._previous_seat = (
+        Ticket.objects.filter(pk=instance.pk)
+        .values_list("flight_id", "row", "seat")
+        .first()
+        if instance.pk is not None
+        else None
+    )
+
+
+@receiver(post_save, sender=Ticket)
+def take_ticket_seat(sender, instance, created, **kwargs) -> None:
+    seat = (instance.row, instance.seat)
+    if created:
+        update_flight_seat_map(instance.flight_id, taken=[seat], sold=1)
+        return
+
+    previous = getattr(instance, "_previous_seat", None)
+    if previous is None or previous == (instance.flight_id, *seat):
+        return
+    # a ticket moved to another seat frees the one it had
+    flight_id, *previous_seat = previous
+    if flight_id == instance.flight_id:
+        update_flight_seat_map(
+            flight_id, taken=[seat], released=[tuple(previous_seat)]
+        )
+    else:
+        update_flight_seat_map(
+            flight_id, released=[tuple(previous_seat)], sold=-1
+        )
+        update_flight_seat_map(instance.flight_id, taken=[seat], sold=1)
+
+
+@receiver(post_delete, sender=Ticket)
+def release_ticket_seat(sender, instance, **kwargs) -> None:
+    update_flight_seat_map(
+        instance.flight_id,
+        released=[(instance.row, instance.seat)],
+        sold=-1,
+    )
+
+
+@receiver(post_delete, sender=SeatHold)
+def release_hold_seats(sender, instance, **kwargs) -> None:
+    """Free the seats of a deleted hold, unless the booking code deleting
+    it has already released them in the locked seat map"""
+    if getattr(instance, "_seats_released", False):
+        return
+
+    update_flight_seat_map(
+        instance.flight_id,
+        released=[(seat["row"], seat["seat"]) for seat in instance.seats],
+        held=-len(instance.seats),
+    )
+    transaction.on_commit(partial(bump_version, SeatHold))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def bump_order_version(sender, **kwargs) -> None:
+    transaction.on_commit(partial(bump_version, sender))
@@ -1,3 +1,901 @@
-from django.test import TestCase
+import base64
+import io
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from airport.tests import (
+    EndpointBudgetMixin,
+    assert_same_json,
+    sample_flight,
+    seed_airport_data,
+)
+from order.booking import SeatsUnavailable, lock_flights, run_with_retry
+from order.idempotency import (
+    IN_FLIGHT_LEASE,
+    IdempotencyKeyLost,
+    heartbeat,
+)
+from airport.models import Airplane, Flight
+from airport.seat_map import SeatMap
+from order.models import IdempotencyKey, Order, SeatHold, Ticket
+from order.serializers import OrderListSerializer, OrderListValuesSerializer
+
+ORDER_URL = reverse("order:order-list")
+
+
+class OrderEndpointBudgetTests(EndpointBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.flights = seed_airport_data()
+        cls.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+        for index, flight in enumerate(cls.flights[:40]):
+            order = Order.objects.create(user=cls.user)
+            for seat in range(1, 4):
+                Ticket.objects.create(
+                    order=order, flight=flight, row=index % 20 + 1, seat=seat
+                )
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, max_queries: int, tickets: list[tuple]):
+        return self.request_with_budget(
+            max_queries,
+            "post",
+            ORDER_URL,
+            throttle_writes=2,
+            data={
+                "tickets": [
+                    {"flight": flight.id, "row": row, "seat": seat}
+                    for flight, row, seat in tickets
+                ]
+            },
+            format="json",
+        )
+
+    def test_order_list(self) -> None:
+        self.request_with_budget(2, "get", ORDER_URL)
+        self.request_with_budget(2, "get", ORDER_URL, data={"page_size": 80})
+
+    def test_order_list_pages_by_created_at(self) -> None:
+        orders = list(
+            Order.objects.filter(user=self.user)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+        url, seen = ORDER_URL, []
+        while url:
+            response = self.request_with_budget(2, "get", url)
+            seen += [order["id"] for order in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(seen, orders)
+        self.assertEqual(len(response.data["results"][0]["tickets"]), 3)
+        self.assertIn(
+            "tickets_available",
+            response.data["results"][0]["tickets"][0]["flight"],
+        )
+
+    def test_order_create_does_not_grow_with_tickets(self) -> None:
+        flight = self.flights[-1]
+
+        self.create_order(9, [(flight, 1, 1)])
+        self.create_order(
+            9, [(flight, row, seat) for row in (2, 3) for seat in range(1, 7)]
+        )
+
+    def test_order_create_over_several_flights(self) -> None:
+        self.create_order(
+            13,
+            [
+                (flight, 1, seat)
+                for flight in self.flights[-3:]
+                for seat in range(1, 4)
+            ],
+        )
+
+    def test_values_serializer_matches_order_list_serializer(self) -> None:
+        assert_same_json(
+            self,
+            OrderListSerializer,
+            OrderListValuesSerializer,
+            Order.objects.order_by("id"),
+        )
+
+
+class BookingMixin:
+    def book(self, *seats, **extra):
+        return self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"flight": self.flight.id, "row": row, "seat": seat}
+                    for row, seat in seats
+                ]
+            },
+            format="json",
+            **extra,
+        )
+
+
+class SeatAllocationTests(BookingMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.flight = sample_flight()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="user@test.com", password="password"
+            )
+        )
+
+    def next_day_flight(self) -> Flight:
+        return Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.flight.airplane,
+            departure_time=self.flight.departure_time + timedelta(days=1),
+            arrival_time=self.flight.arrival_time + timedelta(days=1),
+        )
+
+    def test_booking_locks_flights_and_inserts_tickets_at_once(self) -> None:
+        with patch(
+            "order.booking.lock_flights", wraps=lock_flights
+        ) as lock, CaptureQueriesContext(connection) as queries:
+            response = self.book((1, 1), (1, 2), (1, 3))
+
+        self.assertEqual(response.status_code, 201)
+        lock.assert_called_once_with([self.flight.id] * 3)
+        inserts = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('INSERT INTO "order_ticket"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_lock_flights_locks_in_primary_key_order(self) -> None:
+        other_flight = self.next_day_flight()
+
+        with CaptureQueriesContext(connection) as queries:
+            flights = lock_flights(
+                [other_flight.id, self.flight.id, other_flight.id]
+            )
+
+        self.assertEqual(list(flights), [self.flight.id, other_flight.id])
+        self.assertEqual(len(queries), 1)
+        self.assertIn("ORDER BY", queries[0]["sql"])
+        if connection.features.has_select_for_update:
+            self.assertIn("FOR UPDATE", queries[0]["sql"])
+
+    def test_taken_seats_conflict(self) -> None:
+        self.book((1, 1), (1, 2))
+
+        response = self.book((1, 2), (1, 3), (1, 1))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.data["seats"],
+            [
+                {"flight": self.flight.id, "row": 1, "seat": 2},
+                {"flight": self.flight.id, "row": 1, "seat": 1},
+            ],
+        )
+        self.assertEqual(Ticket.objects.count(), 2)
+
+    def test_seat_repeated_in_order_is_invalid(self) -> None:
+        response = self.book((1, 1), (1, 1))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Ticket.objects.exists())
+
+    def auto_assign(self, passengers: int):
+        return self.client.post(
+            ORDER_URL,
+            {
+                "auto_assign": {
+                    "flight": self.flight.id,
+                    "passengers": passengers,
+                }
+            },
+            format="json",
+        )
+
+    def test_auto_assign_books_adjacent_seats(self) -> None:
+        self.book((1, 1), (1, 3), (1, 5))
+
+        response = self.auto_assign(3)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [
+                (ticket["row"], ticket["seat"])
+                for ticket in response.data["tickets"]
+            ],
+            [(2, 1), (2, 2), (2, 3)],
+        )
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 6)
+
+    def test_auto_assign_without_enough_seats_conflicts(self) -> None:
+        self.flight.airplane.rows = 1
+        self.flight.airplane.seats_in_row = 2
+        self.flight.airplane.save()
+
+        response = self.auto_assign(3)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_auto_assign_excludes_tickets(self) -> None:
+        response = self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}],
+                "auto_assign": {"flight": self.flight.id, "passengers": 2},
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("auto_assign", response.data)
+
+    def test_find_adjacent_spreads_over_neighbouring_rows(self) -> None:
+        seat_map = SeatMap(4, 3)
+        for row, seat in ((1, 1), (1, 2), (2, 1), (2, 2), (3, 2), (4, 2)):
+            seat_map.take(row, seat)
+
+        self.assertEqual(seat_map.find_adjacent(2), [(3, 1), (3, 3)])
+        self.assertEqual(seat_map.find_adjacent(3), [(2, 3), (3, 1), (3, 3)])
+        self.assertIsNone(seat_map.find_adjacent(7))
+
+    def test_seat_map_packs_seats_least_significant_bit_first(self) -> None:
+        seat_map = SeatMap(2, 5)
+        seat_map.take(1, 1)
+        seat_map.take(2, 4)
+        seat_map.take(2, 5)
+        seat_map.release(1, 1)
+
+        self.assertEqual(seat_map.to_bytes(), bytes([0b0, 0b11]))
+        self.assertEqual(
+            SeatMap(2, 5, seat_map.to_bytes()).taken_places(),
+            [{"row": 2, "seat": 4}, {"row": 2, "seat": 5}],
+        )
+        self.assertEqual((seat_map.taken_count, seat_map.free_count), (2, 8))
+        with self.assertRaises(IndexError):
+            seat_map.take(3, 1)
+
+    def test_seats_endpoint_returns_seat_map(self) -> None:
+        self.book((1, 1), (2, 3))
+
+        response = self.client.get(
+            reverse("airport:flight-seats", args=[self.flight.id])
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data,
+            {
+                "rows": 20,
+                "seats_in_row": 6,
+                "taken": 2,
+                "free": 118,
+                # bits 0 and 8: (1, 1) and (2, 3) of 6 seats in a row
+                "seat_map": base64.b64encode(
+                    bytes([0b1, 0b1]) + bytes(13)
+                ).decode(),
+            },
+        )
+
+    def test_seats_of_unknown_flight_are_not_found(self) -> None:
+        for pk in (self.flight.id + 1, "abc"):
+            response = self.client.get(
+                reverse("airport:flight-seats", args=[pk])
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_moved_ticket_frees_its_seat(self) -> None:
+        other_flight = self.next_day_flight()
+        self.book((1, 1))
+        ticket = Ticket.objects.get()
+
+        ticket.row = 3
+        ticket.save()
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 3, "seat": 1}],
+        )
+        self.assertEqual(self.flight.tickets_sold, 1)
+
+        ticket.flight = other_flight
+        ticket.save()
+        self.flight.refresh_from_db()
+        other_flight.refresh_from_db()
+        self.assertEqual(SeatMap.for_flight(self.flight).taken_places(), [])
+        self.assertEqual(
+            SeatMap.for_flight(other_flight).taken_places(),
+            [{"row": 3, "seat": 1}],
+        )
+        self.assertEqual(
+            (self.flight.tickets_sold, other_flight.tickets_sold), (0, 1)
+        )
+
+    def test_new_airplane_must_seat_booked_tickets(self) -> None:
+        self.book((1, 5))
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="admin@test.com", password="password", is_staff=True
+            )
+        )
+        url = reverse("airport:flight-detail", args=[self.flight.id])
+        airplane_type = self.flight.airplane.airplane_type
+
+        narrow = Airplane.objects.create(
+            name="Narrow", rows=20, seats_in_row=4, airplane_type=airplane_type
+        )
+        response = self.client.patch(url, {"airplane": narrow.id})
+        self.assertEqual(response.status_code, 400)
+
+        wide = Airplane.objects.create(
+            name="Wide", rows=30, seats_in_row=5, airplane_type=airplane_type
+        )
+        response = self.client.patch(url, {"airplane": wide.id})
+        self.assertEqual(response.status_code, 200)
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 1, "seat": 5}],
+        )
+        self.assertEqual(self.book((2, 1)).status_code, 201)
+
+    def test_resized_airplane_rebuilds_seat_maps(self) -> None:
+        self.book((2, 1))
+        airplane = self.flight.airplane
+
+        airplane.seats_in_row = 4
+        airplane.save()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 2, "seat": 1}],
+        )
+        self.assertEqual(self.flight.tickets_sold, 1)
+
+    def test_reconcile_reports_seats_not_on_the_airplane(self) -> None:
+        self.book((1, 6), (2, 1))
+        Airplane.objects.filter(pk=self.flight.airplane_id).update(
+            seats_in_row=4
+        )
+        out = io.StringIO()
+
+        call_command("reconcile_flight_seats", stdout=out)
+
+        self.assertIn(
+            f"Flight {self.flight.id}: row 1, seat 6 is not on its airplane",
+            out.getvalue(),
+        )
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 2, "seat": 1}],
+        )
+
+
+class TicketsSoldTests(BookingMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.flight = sample_flight()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="user@test.com", password="password"
+            )
+        )
+
+    def tickets_available(self) -> int:
+        response = self.client.get(reverse("airport:flight-list"))
+        return response.data["results"][0]["tickets_available"]
+
+    def test_counter_follows_booked_and_deleted_tickets(self) -> None:
+        self.book((1, 1), (1, 2))
+        self.book((2, 1))
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 3)
+        self.assertEqual(self.tickets_available(), 117)
+
+        Order.objects.filter(tickets__row=1).distinct().delete()
+        Ticket.objects.get().delete()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 0)
+        self.assertEqual(self.tickets_available(), 120)
+
+    def test_reconcile_rebuilds_drifted_counters(self) -> None:
+        self.book((1, 1), (1, 2))
+        Flight.objects.filter(pk=self.flight.pk).update(
+            seat_map=b"", tickets_sold=7, tickets_held=2
+        )
+        out = io.StringIO()
+
+        call_command("reconcile_flight_seats", stdout=out)
+
+        self.assertIn("Reconciled 1 flights, 1 fixed", out.getvalue())
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            (self.flight.tickets_sold, self.flight.tickets_held), (2, 0)
+        )
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 1, "seat": 1}, {"row": 1, "seat": 2}],
+        )
+
+        call_command("reconcile_flight_seats", self.flight.id, stdout=out)
+        self.assertIn("Reconciled 1 flights, 0 fixed", out.getvalue())
+
+    def test_saving_a_stale_flight_keeps_seats_booked_since(self) -> None:
+        stale = Flight.objects.get(pk=self.flight.pk)
+        self.book((1, 1))
+
+        stale.departure_time += timedelta(hours=1)
+        stale.save()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.departure_time, stale.departure_time)
+        self.assertEqual(self.flight.tickets_sold, 1)
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 1, "seat": 1}],
+        )
+
+
+class SeatHoldTests(BookingMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.flight = sample_flight()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.holds_url = reverse(
+            "airport:flight-holds", args=[self.flight.id]
+        )
+
+    def hold(self, *seats, **params):
+        return self.client.post(
+            self.holds_url,
+            {
+                "seats": [{"row": row, "seat": seat} for row, seat in seats],
+                **params,
+            },
+            format="json",
+        )
+
+    def order(self, hold_id: int):
+        return self.client.post(ORDER_URL, {"hold": hold_id}, format="json")
+
+    def expire(self, hold_id: int) -> None:
+        SeatHold.objects.filter(pk=hold_id).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_held_seats_count_as_taken(self) -> None:
+        response = self.hold((1, 1), (1, 2), minutes=5)
+
+        self.assertEqual(response.status_code, 201)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_held, 2)
+        self.assertEqual(
+            self.flight.tickets_available, self.flight.airplane.capacity - 2
+        )
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 1, "seat": 1}, {"row": 1, "seat": 2}],
+        )
+        self.assertEqual(self.hold((1, 2)).status_code, 409)
+        self.assertEqual(
+            self.book((1, 1)).data["seats"],
+            [{"flight": self.flight.id, "row": 1, "seat": 1}],
+        )
+
+    def test_hold_becomes_order(self) -> None:
+        hold_id = self.hold((2, 1), (2, 2)).data["id"]
+
+        response = self.order(hold_id)
+
+        self.assertEqual(response.status_code, 201)
+        tickets = response.data["tickets"]
+        self.assertEqual(
+            [(ticket["row"], ticket["seat"]) for ticket in tickets],
+            [(2, 1), (2, 2)],
+        )
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            (self.flight.tickets_sold, self.flight.tickets_held), (2, 0)
+        )
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertEqual(self.order(hold_id).status_code, 400)
+
+    def test_hold_of_another_user_is_not_found(self) -> None:
+        hold_id = self.hold((1, 1)).data["id"]
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="other@test.com", password="password"
+            )
+        )
+
+        self.assertEqual(self.order(hold_id).status_code, 400)
+
+    def test_expired_hold_can_not_be_ordered(self) -> None:
+        hold_id = self.hold((1, 1)).data["id"]
+        self.expire(hold_id)
+
+        response = self.order(hold_id)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("hold", response.data)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_held, 1)
+
+    def test_expired_hold_is_released_by_next_booking(self) -> None:
+        self.expire(self.hold((1, 1)).data["id"])
+
+        self.assertEqual(self.book((1, 1)).status_code, 201)
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            (self.flight.tickets_sold, self.flight.tickets_held), (1, 0)
+        )
+
+    def test_sweeper_releases_expired_holds(self) -> None:
+        self.expire(self.hold((1, 1), (1, 2)).data["id"])
+        self.hold((3, 3))
+
+        call_command("expire_seat_holds", batch_size=1, stdout=io.StringIO())
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_held, 1)
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 3, "seat": 3}],
+        )
+
+    def test_holds_of_deleted_user_are_released(self) -> None:
+        self.hold((1, 1), (1, 2))
+        other_user = get_user_model().objects.create_user(
+            email="other@test.com", password="password"
+        )
+        self.client.force_authenticate(other_user)
+        self.hold((2, 2))
+
+        other_user.delete()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_held, 2)
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 1, "seat": 1}, {"row": 1, "seat": 2}],
+        )
+
+    def test_deleted_holds_are_released(self) -> None:
+        first = self.hold((1, 1), (1, 2)).data["id"]
+        second = self.hold((2, 2)).data["id"]
+        self.hold((3, 3))
+
+        SeatHold.objects.get(pk=first).delete()
+        SeatHold.objects.filter(pk=second).delete()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_held, 1)
+        self.assertEqual(
+            SeatMap.for_flight(self.flight).taken_places(),
+            [{"row": 3, "seat": 3}],
+        )
+
+    def test_holds_of_unknown_flight_are_not_found(self) -> None:
+        for pk in (self.flight.id + 1, "abc"):
+            response = self.client.post(
+                reverse("airport:flight-holds", args=[pk]),
+                {"seats": [{"row": 1, "seat": 1}]},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 404)
+
+
+class IdempotencyTests(BookingMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.flight = sample_flight()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_retry_replays_first_response(self) -> None:
+        first = self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(
+            any("order_ticket" in query["sql"] for query in queries)
+        )
+
+    def test_client_errors_are_replayed(self) -> None:
+        self.book((1, 1))
+        first = self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        retry = self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(first.status_code, 409)
+        self.assertEqual(retry.status_code, 409)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+
+    def test_key_reused_for_other_request(self) -> None:
+        self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        response = self.book((1, 2), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_keys_are_per_user(self) -> None:
+        self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="other@test.com", password="password"
+            )
+        )
+
+        response = self.book((1, 2), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_expired_key_runs_again(self) -> None:
+        self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        response = self.book((1, 2), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    @patch("order.idempotency.IN_FLIGHT_WAIT", 0.1)
+    def test_duplicate_of_request_in_flight_waits(self) -> None:
+        self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+        IdempotencyKey.objects.update(status_code=None, response=None)
+
+        response = self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_abandoned_in_flight_is_reclaimed(self) -> None:
+        self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+        IdempotencyKey.objects.update(
+            status_code=None,
+            response=None,
+            heartbeat_at=timezone.now() - IN_FLIGHT_LEASE,
+        )
+
+        response = self.book((1, 2), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    @patch("order.idempotency.IN_FLIGHT_WAIT", 0.1)
+    def test_slow_request_with_heartbeat_keeps_its_key(self) -> None:
+        self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+        IdempotencyKey.objects.update(
+            status_code=None,
+            response=None,
+            created_at=timezone.now() - IN_FLIGHT_LEASE * 10,
+        )
+
+        response = self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_response_of_reclaimed_key_is_not_lost_silently(self) -> None:
+        @contextmanager
+        def reclaimed(record):
+            yield
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+
+        with patch("order.idempotency.heartbeat", reclaimed):
+            with self.assertRaises(IdempotencyKeyLost):
+                self.book((1, 1), HTTP_IDEMPOTENCY_KEY="order-1")
+
+    def test_sweeper_deletes_stale_keys(self) -> None:
+        for seat, key in enumerate(
+            ("expired", "abandoned", "in-flight", "stored"), start=1
+        ):
+            self.book((1, seat), HTTP_IDEMPOTENCY_KEY=key)
+        now = timezone.now()
+        IdempotencyKey.objects.filter(key="expired").update(expires_at=now)
+        IdempotencyKey.objects.filter(key="abandoned").update(
+            status_code=None, heartbeat_at=now - IN_FLIGHT_LEASE
+        )
+        IdempotencyKey.objects.filter(key="in-flight").update(
+            status_code=None
+        )
+        out = io.StringIO()
+
+        call_command("expire_idempotency_keys", batch_size=1, stdout=out)
+
+        self.assertIn("Deleted 2 idempotency keys", out.getvalue())
+        self.assertEqual(
+            set(IdempotencyKey.objects.values_list("key", flat=True)),
+            {"in-flight", "stored"},
+        )
+
+
+class HeartbeatTests(TransactionTestCase):
+    @patch("order.idempotency.HEARTBEAT_INTERVAL", 0.01)
+    def test_heartbeat_touches_key_until_the_block_ends(self) -> None:
+        past = timezone.now() - IN_FLIGHT_LEASE
+        record = IdempotencyKey.objects.create(
+            user=get_user_model().objects.create_user(
+                email="user@test.com", password="password"
+            ),
+            key="order-1",
+            fingerprint="",
+            heartbeat_at=past,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+
+        with heartbeat(record):
+            deadline = time.monotonic() + 5
+            while (
+                IdempotencyKey.objects.get().heartbeat_at == past
+                and time.monotonic() < deadline
+            ):
+                time.sleep(0.01)
+        touched = IdempotencyKey.objects.get().heartbeat_at
+        time.sleep(0.05)
+
+        self.assertGreater(touched, past)
+        self.assertEqual(IdempotencyKey.objects.get().heartbeat_at, touched)
+
+
+class RetryTests(TransactionTestCase):
+    def setUp(self) -> None:
+        flight = sample_flight()
+        order = Order.objects.create(
+            user=get_user_model().objects.create_user(
+                email="user@test.com", password="password"
+            )
+        )
+        self.ticket = partial(Ticket, order=order, flight=flight)
+        Ticket.objects.bulk_create([self.ticket(row=1, seat=1)])
+
+    def test_lost_race_is_retried(self) -> None:
+        calls = []
+
+        def lose_first_race() -> str:
+            calls.append(1)
+            seat = 1 if len(calls) == 1 else 2
+            Ticket.objects.bulk_create([self.ticket(row=1, seat=seat)])
+            return "booked"
+
+        with patch("order.booking.BACKOFF", 0):
+            self.assertEqual(run_with_retry(lose_first_race), "booked")
+        self.assertEqual(len(calls), 2)
+
+    def test_seat_conflict_of_last_attempt_is_unavailable(self) -> None:
+        calls = []
+
+        def always_lose() -> None:
+            calls.append(1)
+            Ticket.objects.bulk_create([self.ticket(row=1, seat=1)])
+
+        with patch("order.booking.BACKOFF", 0), self.assertRaises(
+            SeatsUnavailable
+        ):
+            run_with_retry(always_lose, attempts=3)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_integrity_errors_are_not_retried(self) -> None:
+        calls = []
+
+        def insert_invalid_ticket() -> None:
+            calls.append(1)
+            Ticket.objects.bulk_create([self.ticket(row=None, seat=2)])
+
+        with self.assertRaises(IntegrityError):
+            run_with_retry(insert_invalid_ticket)
+        self.assertEqual(len(calls), 1)
+
+
+@skipUnless(
+    connection.vendor == "postgresql", "needs row locks across connections"
+)
+class SeatAllocationStressTests(TransactionTestCase):
+    threads = 24
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.throttle_classes = APIView.throttle_classes
+        APIView.throttle_classes = ()
+        self.flight = sample_flight()
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"user{index}@test.com", password="password"
+            )
+            for index in range(self.threads)
+        ]
+
+    def tearDown(self) -> None:
+        APIView.throttle_classes = self.throttle_classes
+
+    def test_no_errors_and_no_oversell(self) -> None:
+        statuses = []
+        barrier = threading.Barrier(self.threads)
+
+        def book(user, seats) -> None:
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                response = client.post(
+                    ORDER_URL,
+                    {
+                        "tickets": [
+                            {"flight": self.flight.id, "row": 1, "seat": seat}
+                            for seat in seats
+                        ]
+                    },
+                    format="json",
+                )
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        # every order competes for overlapping seats of the first row
+        workers = [
+            threading.Thread(
+                target=book, args=(user, (index % 6 + 1, (index + 1) % 6 + 1))
+            )
+            for index, user in enumerate(self.users)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(set(statuses) - {201, 409}, set())
+        self.assertEqual(len(statuses), self.threads)
+        self.assertEqual(
+            Ticket.objects.filter(flight=self.flight).count(),
+            self.flight.tickets_sold,
+        )
+        self.assertLessEqual(self.flight.tickets_sold, 6)
+        self.assertEqual(statuses.count(201) * 2, self.flight.tickets_sold)
@@ -1,35 +1,73 @@
 from typing import Type
 
-from django.db.models import QuerySet
+from django.db.models import Prefetch, QuerySet
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import mixins
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.serializers import Serializer
 from rest_framework.viewsets import GenericViewSet
 
-from order.models import Order
-from order.serializers import OrderSerializer, OrderListSerializer
+from airport.conditional import ConditionalGetMixin
+from airport.models import Airplane, Airport, Route, Flight
+from airport.pagination import KeysetPagination
+from airport.values import ValuesListMixin
+from order.idempotency import IDEMPOTENCY_HEADER, IdempotentCreateMixin
+from order.models import Order, SeatHold, Ticket
+from order.serializers import (
+    OrderSerializer,
+    OrderListSerializer,
+    OrderListValuesSerializer,
+)
 
 
-class OrderPagination(PageNumberPagination):
+class OrderPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
     page_size = 5
     max_page_size = 80
 
 
 class OrderViewSet(
+    ConditionalGetMixin,
+    IdempotentCreateMixin,
+    ValuesListMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     GenericViewSet,
 ):
+    # a page of orders and all of its tickets are two queries
     queryset = Order.objects.prefetch_related(
-        "tickets__flight__route", "tickets__flight__airplane"
+        Prefetch(
+            "tickets",
+            queryset=Ticket.objects.select_related(
+                "flight__route__source",
+                "flight__route__destination",
+                "flight__airplane",
+            ),
+        )
     )
     serializer_class = OrderSerializer
+    values_serializer_class = OrderListValuesSerializer
     pagination_class = OrderPagination
     permission_classes = (IsAuthenticated,)
+    versioned_models = (
+        Order,
+        Ticket,
+        SeatHold,
+        Flight,
+        Route,
+        Airport,
+        Airplane,
+    )
+    conditional_per_user = True
 
     def get_queryset(self) -> QuerySet:
-        return Order.objects.filter(user=self.request.user)
+        return self.queryset.filter(user=self.request.user)
+
+    def get_throttles(self) -> list:
+        if self.action == "create":
+            self.throttle_scope = "orders"
+        return super().get_throttles()
 
     def get_serializer_class(self) -> Type[Serializer]:
         if self.action == "list":
@@ -37,5 +75,21 @@ class OrderViewSet(
 
         return OrderSerializer
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name=IDEMPOTENCY_HEADER,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.HEADER,
+                description=(
+                    "Unique key of the order, retries with the same key "
+                    "get the first response back instead of ordering again"
+                ),
+            ),
+        ]
+    )
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer) -> None:
         serializer.save(user=self.request.user)
@@ -0,0 +1,173 @@
+import time
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+USER_CACHE_KEY = "jwt-user-fields:{}"
+# what authentication and permissions read, never the password hash
+CACHED_USER_FIELDS = ("email", "is_active", "is_staff", "is_superuser")
+# the shared cache is invalidated on every user change, the users cached
+# by each process only expire, so their timeout bounds the staleness
+SHARED_CACHE_TIMEOUT = 5 * 60
+LOCAL_CACHE_TIMEOUT = 10
+LOCAL_CACHE_SIZE = 10_000
+
+_local_users = {}
+
+
+def user_fields(user) -> dict:
+    """The cached fields of a user, with a digest of the password hash
+    when tokens are revoked on password changes"""
+    fields = {"pk": user.pk}
+    for name in CACHED_USER_FIELDS:
+        fields[name] = getattr(user, name)
+    if api_settings.CHECK_REVOKE_TOKEN:
+        fields["password_digest"] = get_md5_hash_password(user.password)
+    return fields
+
+
+def user_from_fields(user_model, fields: dict):
+    """Unsaved user instance of the cached fields, the other fields are
+    deferred and loaded on access"""
+    names = [user_model._meta.pk.attname, *CACHED_USER_FIELDS]
+    return user_model.from_db(
+        None,
+        names,
+        [fields["pk"], *(fields[name] for name in CACHED_USER_FIELDS)],
+    )
+
+
+def get_local_user(key: str):
+    entry = _local_users.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def get_cached_user(user_id):
+    key = USER_CACHE_KEY.format(user_id)
+    fields = get_local_user(key)
+    if fields is None:
+        fields = cache.get(key)
+        if fields is not None:
+            remember_locally(key, fields)
+    return fields
+
+
+async def aget_cached_user(user_id):
+    key = USER_CACHE_KEY.format(user_id)
+    fields = get_local_user(key)
+    if fields is None:
+        fields = await cache.aget(key)
+        if fields is not None:
+            remember_locally(key, fields)
+    return fields
+
+
+def cache_user(user_id, user) -> None:
+    key = USER_CACHE_KEY.format(user_id)
+    fields = user_fields(user)
+    cache.set(key, fields, SHARED_CACHE_TIMEOUT)
+    remember_locally(key, fields)
+
+
+async def acache_user(user_id, user) -> None:
+    key = USER_CACHE_KEY.format(user_id)
+    fields = user_fields(user)
+    await cache.aset(key, fields, SHARED_CACHE_TIMEOUT)
+    remember_locally(key, fields)
+
+
+def remember_locally(key: str, fields: dict) -> None:
+    if len(_local_users) >= LOCAL_CACHE_SIZE:
+        _local_users.clear()
+    _local_users[key] = (time.monotonic() + LOCAL_CACHE_TIMEOUT, fields)
+
+
+def forget_user(user_id) -> None:
+    key = USER_CACHE_KEY.format(user_id)
+    cache.delete(key)
+    _local_users.pop(key, None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reading the user from the cache.
+
+    The fields of users that authentication and permissions need are
+    kept in the shared cache and for a few seconds in the process, and
+    dropped from the cache when the user is saved or deleted.
+    The users table is only read on a cache miss.
+    Async views authenticate with ``aauthenticate``.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        fields = get_cached_user(user_id)
+        if fields is None:
+            user = super().get_user(validated_token)
+            cache_user(user_id, user)
+            return user
+
+        self.check_user(fields, validated_token)
+        return user_from_fields(self.user_model, fields)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            # raises InvalidToken without touching the database
+            return super().get_user(validated_token)
+
+        fields = await aget_cached_user(user_id)
+        if fields is None:
+            try:
+                user = await self.user_model.objects.aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(
+                    _("User not found"), code="user_not_found"
+                )
+            self.check_user(user_fields(user), validated_token)
+            await acache_user(user_id, user)
+            return user
+
+        self.check_user(fields, validated_token)
+        return user_from_fields(self.user_model, fields)
+
+    @staticmethod
+    def check_user(fields: dict, validated_token) -> None:
+        if not fields["is_active"]:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != fields["password_digest"]:
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code="password_changed",
+            )
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = CachedJWTAuthentication
@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThrottleBucket",
+            fields=[
+                (
+                    "key",
+                    models.CharField(
+                        max_length=255, primary_key=True, serialize=False
+                    ),
+                ),
+                ("tokens", models.FloatField()),
+                ("updated_at", models.FloatField()),
+                ("allowed", models.BooleanField(default=True)),
+            ],
+        ),
+    ]
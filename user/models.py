@@ -48,3 +48,15 @@ class User(AbstractUser):
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of a throttle key, see airport_service.throttling"""
+
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()
+    allowed = models.BooleanField(default=True)
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.tokens:.2f}"
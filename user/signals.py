@@ -0,0 +1,17 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user.authentication import forget_user
+from user.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs) -> None:
+    """Drop the user from the authentication cache, again after commit so
+    a request racing the write can not cache the old row"""
+    forget_user(instance.pk)
+    transaction.on_commit(partial(forget_user, instance.pk))
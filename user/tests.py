@@ -1,3 +1,144 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from airport.tests import EndpointBudgetMixin
+from user.authentication import USER_CACHE_KEY, CachedJWTAuthentication
+
+
+class UserEndpointBudgetTests(EndpointBudgetMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+
+    def test_register(self) -> None:
+        self.request_with_budget(
+            2,
+            "post",
+            reverse("user:create"),
+            # anonymous, user and auth scope buckets
+            throttle_writes=3,
+            data={"email": "new@test.com", "password": "password"},
+        )
+
+    def test_token(self) -> None:
+        response = self.request_with_budget(
+            2,
+            "post",
+            reverse("user:token_obtain_pair"),
+            throttle_writes=3,
+            data={"email": "user@test.com", "password": "password"},
+        )
+        self.request_with_budget(
+            1,
+            "post",
+            reverse("user:token_refresh"),
+            throttle_writes=3,
+            data={"refresh": response.data["refresh"]},
+        )
+
+    def test_me(self) -> None:
+        self.client.force_authenticate(self.user)
+
+        self.request_with_budget(0, "get", reverse("user:manage"))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+        self.token = self.client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": "user@test.com", "password": "password"},
+        ).data["access"]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def user_queries(self, url: str) -> tuple[int, int]:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response.status_code, sum(
+            "user_user" in query["sql"] for query in context.captured_queries
+        )
+
+    def test_user_is_read_once(self) -> None:
+        url = reverse("airport:flight-list")
+
+        self.assertEqual(self.user_queries(url), (200, 1))
+        self.assertEqual(self.user_queries(url), (200, 0))
+
+    def test_deactivated_user_is_rejected(self) -> None:
+        url = reverse("airport:flight-list")
+        self.user_queries(url)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.user_queries(url), (401, 1))
+
+    def test_manage_view_reads_current_user(self) -> None:
+        self.user_queries(reverse("airport:flight-list"))
+
+        self.assertEqual(self.user_queries(reverse("user:manage")), (200, 1))
+
+    def test_password_hash_is_not_cached(self) -> None:
+        self.user_queries(reverse("airport:flight-list"))
+
+        fields = cache.get(USER_CACHE_KEY.format(self.user.pk))
+        self.assertEqual(
+            fields,
+            {
+                "pk": self.user.pk,
+                "email": "user@test.com",
+                "is_active": True,
+                "is_staff": False,
+                "is_superuser": False,
+            },
+        )
+
+    def test_cached_user_has_permission_fields(self) -> None:
+        self.user.is_staff = True
+        self.user.save()
+        request = APIRequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        authentication = CachedJWTAuthentication()
+        authentication.authenticate(request)
+
+        with CaptureQueriesContext(connection) as context:
+            user, _ = authentication.authenticate(request)
+
+        self.assertEqual(len(context), 0)
+        self.assertEqual((user.pk, user.is_staff), (self.user.pk, True))
+        # other fields are loaded when used
+        self.assertEqual(user.password, self.user.password)
+
+    @patch.object(jwt_settings, "CHECK_REVOKE_TOKEN", True)
+    def test_password_change_revokes_cached_tokens(self) -> None:
+        token = self.client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": "user@test.com", "password": "password"},
+        ).data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = reverse("airport:flight-list")
+        self.assertEqual(self.user_queries(url), (200, 1))
+        self.assertIn(
+            "password_digest", cache.get(USER_CACHE_KEY.format(self.user.pk))
+        )
+
+        self.user.set_password("changed")
+        self.user.save()
 
-# Create your tests here.
+        self.assertEqual(self.user_queries(url)[0], 401)
@@ -1,12 +1,12 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
+from user.views import (
+    CreateUserView,
+    ManageUserView,
     TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView,
 )
 
-from user.views import CreateUserView, ManageUserView
-
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
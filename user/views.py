@@ -1,5 +1,6 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt import views as jwt_views
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from user.serializers import UserSerializer
@@ -7,10 +8,24 @@ from user.serializers import UserSerializer
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_scope = "auth"
+
+
+class TokenObtainPairView(jwt_views.TokenObtainPairView):
+    throttle_scope = "auth"
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    throttle_scope = "auth"
+
+
+class TokenVerifyView(jwt_views.TokenVerifyView):
+    throttle_scope = "auth"
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
+    # updates need the current row, not a cached copy
     authentication_classes = (JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 